@@ -1,375 +1,366 @@
-import json
-import yfinance as yf # type: ignore
-import re
-from selenium import webdriver # type: ignore
-from selenium.webdriver.chrome.service import Service # type: ignore
-from selenium.webdriver.chrome.options import Options # type: ignore
-from selenium.webdriver.common.by import By # type: ignore
-from selenium.webdriver.support.ui import WebDriverWait # type: ignore
-from selenium.webdriver.support import expected_conditions as EC # type: ignore
 import time
-import os
-import robin_stocks.robinhood as r # type: ignore
-from dotenv import load_dotenv # type: ignore
-import pyotp # type: ignore
-import firebase_admin # type: ignore
-from firebase_admin import credentials, firestore # type: ignore
-from datetime import datetime, timedelta, timezone
-import base64
-
-# Load environment variables
-load_dotenv()
-
-print("Starting at time: ", datetime.now())
-
-# Firebase setup
-firebase_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
-if not firebase_key:
-    raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY not set or loaded properly.")
-
-service_account_info = json.loads(base64.b64decode(firebase_key).decode('utf-8'))
-cred = credentials.Certificate(service_account_info)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-def track_market_data(test_symbol, test_expiration, test_strike, duration=12, sleep_interval=2, max_iterations=10):
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+from backtest import save_screener_snapshot
+from chainCache import cached_chain, get_call_chain, get_expirations
+from chainScoring import rank_candidates
+from firestoreWriter import latest_options_doc, write_options
+from highJournal import HighJournal, replay_leftovers
+from highTracker import HighPriceTracker
+from metrics import observe, start_metrics_export
+from optionContract import OptionContract, OptionQuote, parse_price
+from optionCache import get_instrument_id, get_open_price, remember_instrument_id, save_instrument_ids
+from robinhoodApi import find_options, get_option_market_data_by_ids, get_stock_quote
+from services import get_db, login_robinhood
+from scheduler import MARKET_TZ, market_open_at, now_pacific, run_polling_session, sleep_until
+from screener import MAX_DAYS_TO_EXPIRY, get_screener_rows
+from tickRecorder import TickRecorder
+
+# Enrichment concurrency: total workers and per-provider in-flight caps. Each lookup gets
+# SYMBOL_TIMEOUT seconds from when it gets its first provider slot, so time spent queued
+# behind other symbols doesn't count; STAGE_TIMEOUT caps the whole stage.
+ENRICH_WORKERS = 16
+PROVIDER_LIMITS = {'yfinance': 8, 'robinhood': 4}
+SYMBOL_TIMEOUT = 20
+STAGE_TIMEOUT = 300
+
+# Live tracking: contracts per batched quote request, how long to follow the picks
+# right after they are made and how often to sample them (seconds)
+LIVE_BATCH_SIZE = 10
+LIVE_TRACK_DURATION = 12
+LIVE_SAMPLE_INTERVAL = 2
+
+# How long the intraday high tracker runs after the open
+SESSION_DURATION = timedelta(hours=1, minutes=30)
+
+provider_slots = {name: threading.BoundedSemaphore(limit) for name, limit in PROVIDER_LIMITS.items()}
+
+# Lookups each enrichment stage dropped in the last run: {stage: {'lookups', 'timed_out', 'failed'}}
+enrichment_drops = {}
+
+class LookupTimer:
+    # A lookup's deadline: the stage's until its first provider slot, its own after that
+    def __init__(self, stage_deadline):
+        self.stage_deadline = stage_deadline
+        self.started_at = None
+
+    def deadline(self):
+        if self.started_at is None:
+            return self.stage_deadline
+        return min(self.stage_deadline, self.started_at + SYMBOL_TIMEOUT)
+
+@contextmanager
+def provider_slot(provider, timer):
+    # Waiting for a slot counts against the deadline, so lookups queued behind hung
+    # calls give up in time instead of blocking until those calls return
+    slot = provider_slots[provider]
+    if not slot.acquire(timeout=max(0, timer.deadline() - time.monotonic())):
+        raise TimeoutError(f"No {provider} slot free before the deadline")
+    if timer.started_at is None:
+        timer.started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        slot.release()
+
+def sample_market_data(contracts):
+    # One batched quote request for a group of contracts, under the shared Robinhood budget
+    start = time.monotonic()
+    with provider_slots['robinhood']:
+        market_data = get_option_market_data_by_ids([contract.instrument_id for contract in contracts])
+    latency = time.monotonic() - start
+    return [(contract, OptionQuote.from_market_data(contract.instrument_id, market_data.get(contract.instrument_id)), latency) for contract in contracts]
+
+def _ready_result(future):
+    if future is None or not future.done() or future.cancelled() or future.exception():
+        return None
+    return future.result()
+
+def print_sample(contract, quote, open_price):
+    test_symbol = contract.symbol
+    if not quote:
+        print(f"No market data for {contract.symbol} {contract.strike} {contract.exp_date}")
+        return
+
+    my_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    my_loop = f"Time: {my_time}\n"
+    my_loop += f"{test_symbol} Last Trade Price {quote.last_trade_price} \n"
+    my_loop += f"{test_symbol} Ask Price {quote.ask_price} \n"
+    my_loop += f"{test_symbol} Bid Price {quote.bid_price} \n"
+    my_loop += f"{test_symbol} Mark Price {quote.mark_price} \n"
+    my_loop += f"{test_symbol} Open Price {open_price if open_price is not None else 'N/A'} \n"
+    print(my_loop)
+
+def print_sample_latencies(latencies):
+    # One series per batch, named after its first contract
+    for option_id, samples in latencies.items():
+        if not samples:
+            print(f"{option_id} batch: no samples")
+            continue
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{option_id} batch: {len(samples)} samples, avg {sum(samples) / len(samples) * 1000:.0f}ms, p95 {p95 * 1000:.0f}ms, max {samples[-1] * 1000:.0f}ms")
+
+def track_market_data(contracts, duration=12, sleep_interval=2, max_iterations=10, recorder=None):
+    # Follow every pick at once: each round fans LIVE_BATCH_SIZE-contract quote requests
+    # out over a pool that shares the Robinhood in-flight budget with the rest of the run
+    tracked = []
+    for contract in contracts:
+        contract.instrument_id = contract.instrument_id or get_instrument_id(contract.symbol, contract.exp_date, contract.strike)
+        if not contract.instrument_id:
+            print(f"Could not find instrument for {contract.symbol} {contract.strike} {contract.exp_date}")
+            continue
+        tracked.append(contract)
+
+    if not tracked:
+        return
+
+    batches = [tracked[i:i + LIVE_BATCH_SIZE] for i in range(0, len(tracked), LIVE_BATCH_SIZE)]
+    latencies = {batch[0].id: [] for batch in batches}
+    # Open prices are looked up once per contract, off the sampling rounds, and only once
+    # the market has opened (before that there is no opening bar to ask for)
+    opens_at = market_open_at()
+    open_prices = {}
+    open_executor = ThreadPoolExecutor(max_workers=min(len(tracked), PROVIDER_LIMITS['robinhood']))
     start_time = datetime.now()
     iterations = 0
 
-    while True:
-        current_time = datetime.now()
-        elapsed_time = (current_time - start_time).total_seconds()
+    with ThreadPoolExecutor(max_workers=min(len(batches), PROVIDER_LIMITS['robinhood'])) as executor:
+        while True:
+            current_time = datetime.now()
+            elapsed_time = (current_time - start_time).total_seconds()
 
-        if elapsed_time > duration or iterations >= max_iterations:
-            break
+            if elapsed_time > duration or iterations >= max_iterations:
+                break
 
-        current_market_price = r.get_option_market_data(test_symbol, test_expiration, test_strike, optionType='call')
-        my_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        my_loop = f"Time: {my_time}\n"
-        my_loop += f"{test_symbol} Last Trade Price {current_market_price[0][0]['last_trade_price']} \n"
-        my_loop += f"{test_symbol} Ask Price {current_market_price[0][0]['ask_price']} \n"
-        my_loop += f"{test_symbol} Bid Price {current_market_price[0][0]['bid_price']} \n"
-        my_loop += f"{test_symbol} Mark Price {current_market_price[0][0]['mark_price']} \n"
-        
-        raw_open_price_data = r.get_option_historicals(test_symbol, test_expiration, test_strike, 'call', interval='5minute', span='day')
-        try:
-            open_price = float(raw_open_price_data[0]["open_price"].replace(',', ''))
-        except:
-            open_price = "N/A"
-        my_loop += f"{test_symbol} Open Price {open_price} \n"
-        
-        print(my_loop)
+            round_start = time.monotonic()
+            if not open_prices and datetime.now(MARKET_TZ) >= opens_at:
+                open_prices = {contract.id: open_executor.submit(get_open_price, contract.instrument_id) for contract in tracked}
+
+            futures = [executor.submit(sample_market_data, batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    samples = future.result()
+                except Exception as e:
+                    print(f"Error tracking market data for {', '.join(contract.symbol for contract in batch)}: {e}")
+                    continue
+
+                latencies[batch[0].id].append(samples[0][2])
+                for contract, quote, _ in samples:
+                    if recorder:
+                        recorder.record(contract.id, quote)
+                    print_sample(contract, quote, _ready_result(open_prices.get(contract.id)))
 
-        iterations += 1
-        time.sleep(sleep_interval)
+            iterations += 1
+            observe('live_tracker.round', time.monotonic() - round_start, kind='loop')
+            # Keep a fixed cadence no matter how long the round took
+            time.sleep(max(0, sleep_interval - (time.monotonic() - round_start)))
+
+    open_executor.shutdown(wait=False, cancel_futures=True)
+    print_sample_latencies(latencies)
 
 def update_firestore_with_new_data(date, new_options):
-    doc_ref = db.collection('options_data').document(date)
-    
-    existing_doc = doc_ref.get()
-    if existing_doc.exists:
-        existing_data = existing_doc.to_dict()
-        existing_options = existing_data.get('options', [])
-    else:
-        existing_options = []
-
-    for new_option in new_options:
-        updated = False
-        for existing_option in existing_options:
-            if existing_option['id'] == new_option['id']:
-                existing_option['percentage'] = new_option['percentage']
-                existing_option['high_price'] = new_option['high_price']
-                existing_option['open_price'] = new_option['open_price']
-                updated = True
-                break
-        if not updated:
-            existing_options.append(new_option)
+    # Only contracts whose values changed since the last write are sent, as one transactional update
+    if write_options(get_db(), date, new_options):
+        print(f"Data for {date} updated in Firestore.")
+
+def chain_candidate(row, timer):
+    # Front-expiry calls table for one gapper, for the scoring pass
+    symbol = row["Symbol"]
+    if symbol == "AS":
+        return None
 
-    doc_ref.set({
-        'date': date,
-        'options': existing_options
-    })
-    print(f"Data for {date} updated in Firestore.")
+    spot = parse_price(row["Premkt. Price"])
+    if not spot:
+        return None
 
-def fetch_and_calculate_option_price():
-    # Explicitly set to the correct path for chromedriverGitHub
-    chromedriver_path = "/usr/local/bin/chromedriver"  # Adjust this path
-    
-    # Set up Selenium with the local chromedriver
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-
-    service = Service(chromedriver_path)
-    driver = webdriver.Chrome(service=service, options=options)
-    
-    # The rest of your code
-    driver.get('https://stockanalysis.com/stocks/screener/')
-    wait = WebDriverWait(driver, 10)
-    print("Page loaded")
-    time.sleep(2)
-
-    button = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Add Filters')]/ancestor::button")))
-    button.click()
-    time.sleep(0.5)
-
-    marketCap = wait.until(EC.element_to_be_clickable((By.ID, "marketCap")))
-    marketCap.click()
-    time.sleep(0.5)
-    
-    postmarketChangePercent = wait.until(EC.element_to_be_clickable((By.ID, "premarketChangePercent")))
-    postmarketChangePercent.click()
-    time.sleep(0.5)
-
-    afterHoursPrice = wait.until(EC.element_to_be_clickable((By.ID, "premarketPrice")))
-    afterHoursPrice.click()
-    time.sleep(0.5)
-
-    marketClosePrice = wait.until(EC.element_to_be_clickable((By.ID, "close")))
-    marketClosePrice.click()
-    time.sleep(0.5)
-
-    close_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[aria-label="Close"]')))
-    close_button.click()
-    time.sleep(0.5)
-    print("Filters added")
-
-    first_any_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[span[text()='Any']]")))
-    first_any_button.click()
-    time.sleep(0.5)
-
-    input_element = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Value']")
-    input_element.clear()
-    input_element.send_keys("2B")
-    time.sleep(0.5)
-    
-    second_any_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[span[text()='Any']]")))
-    second_any_button.click()
-    time.sleep(0.5)
-
-    input_element = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Value']")
-    input_element.clear()
-    input_element.send_keys("8")
-    print("Filters set")
-    
-    time.sleep(0.5)
+    with provider_slot('yfinance', timer):
+        expirations = get_expirations(symbol)
+
+    if not expirations:
+        return None
+
+    # Check the front expiry before downloading its chain
+    target_expiration = expirations[0]
+    target_expiration_date = datetime.strptime(target_expiration, '%Y-%m-%d')
+    today = datetime.today()
+    difference = (target_expiration_date - today).days
+
+    if difference > MAX_DAYS_TO_EXPIRY:
+        return None
+
+    with provider_slot('yfinance', timer):
+        chain = get_call_chain(symbol, target_expiration)
+
+    if not len(chain['strike']):
+        return None
+    return symbol, target_expiration, spot, chain
+
+def lookup_contract(symbol, target_expiration, target_strike, timer):
+    try:
+        with provider_slot('robinhood', timer):
+            # One quote carries both prices (r.get_latest_price would fetch it again)
+            quote = get_stock_quote(symbol)
+            stock_close_price = quote['previous_close']
+            current_stock_price = quote.get('last_extended_hours_trade_price') or quote['last_trade_price']
+            options = find_options(symbol, target_expiration, target_strike)
+        instrument_id = options[0]['id']
+        remember_instrument_id(symbol, target_expiration, target_strike, instrument_id)
+
+    except Exception as e:
+        print(f"Error fetching data for {symbol}: {e}")
+        return None
 
-    filters_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//li/button[contains(@class, 'dont-move') and contains(text(), 'Filters')]")))
-    filters_button.click()
-    time.sleep(2)
+    print(f'\n\nStock price at market close: {stock_close_price} for {symbol}')
+    print(f'Stock price before market open: {current_stock_price} for {symbol}')
+
+    return OptionContract(symbol, target_strike, 'Call', target_expiration, instrument_id)
+
+def _map_with_deadline(function, items, describe, stage):
+    # Fan lookups out over a worker pool so the pre-open window is spent waiting on the
+    # network. Each lookup is dropped once its own deadline passes, every one left at
+    # STAGE_TIMEOUT; results come back in input order.
+    stage_deadline = time.monotonic() + STAGE_TIMEOUT
+    timers = [LookupTimer(stage_deadline) for _ in items]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(ENRICH_WORKERS, len(items))))
+    futures = [executor.submit(function, *item, timer) for item, timer in zip(items, timers)]
+
+    pending = set(futures)
+    timed_out = set()
+    while pending:
+        now = time.monotonic()
+        for future, timer in zip(futures, timers):
+            if future in pending and now >= timer.deadline():
+                pending.discard(future)
+                timed_out.add(future)
+        if not pending:
+            break
+        # Deadlines move up as lookups start, so check again at least once a second
+        next_deadline = min(timer.deadline() for future, timer in zip(futures, timers) if future in pending)
+        done, pending = wait(pending, timeout=min(1.0, max(0, next_deadline - now)), return_when=FIRST_COMPLETED)
+
+    results = []
+    failed = 0
+    for item, future in zip(items, futures):
+        if future in timed_out:
+            future.cancel()
+            print(f"Timed out enriching {describe(item)}")
+            continue
+        try:
+            result = future.result()
+        except Exception as e:
+            failed += 1
+            print(f"Error enriching {describe(item)}: {e}")
+            continue
 
-    tbody = driver.find_element(By.CSS_SELECTOR, 'tbody')
+        if result:
+            results.append(result)
 
-    column_names = ['Symbol', 'Company Name', 'Market Cap', 'Premkt. Chg.', 'Premkt. Price', 'Close']
-    data = []
-    lines = tbody.text.strip().split('\n')
+    enrichment_drops[stage] = {'lookups': len(items), 'timed_out': len(timed_out), 'failed': failed}
+    if timed_out or failed:
+        print(f"{stage}: dropped {len(timed_out) + failed} of {len(items)} lookups ({len(timed_out)} timed out, {failed} failed)")
 
-    for line in lines:
-        match = re.match(r'(\w+)\s+([\w\s,.&-]+?)\s+(\d+\.\d+B)\s+(-?\d+\.\d+%)?\s+([\d,.]+)\s+(-|[\d,.]+)', line)
-        if match:
-            fields = match.groups()
-            row_dict = {column_names[i]: fields[i] for i in range(len(column_names))}
-            data.append(row_dict)
+    # Don't block on stragglers that already blew their deadline
+    executor.shutdown(wait=False)
+    return results
 
-    driver.quit()
-    print("Browser closed")
+def enrich_screener_rows(rows):
+    # Download every gapper's front-expiry chain, rank all their strikes in one scoring
+    # pass and only look the top contracts up on Robinhood
+    candidates = _map_with_deadline(chain_candidate, [(row,) for row in rows], lambda item: item[0]['Symbol'], 'chains')
+    picks = rank_candidates(candidates)
+    return _map_with_deadline(lookup_contract, picks, lambda item: item[0], 'contracts')
 
-    json_data = data
+def fetch_and_calculate_option_price():
+    json_data = get_screener_rows()
     today_str = datetime.today().strftime('%Y-%m-%d')
     
-    mfa_key = os.getenv('ROBIN_MFA')
-    username = os.getenv('ROBIN_USERNAME')
-    password = os.getenv('ROBIN_PASSWORD')
-    if not all([mfa_key, username, password]):
-        raise EnvironmentError("One or more environment variables are missing.")
-
-    # Generate the MFA code using pyotp
-    totp = pyotp.TOTP(os.getenv('ROBIN_MFA')).now()
-    
-    # Login to Robinhood using the MFA code
-    login = r.login(username, password, store_session=False, mfa_code=totp)
-   
-    print("Logged in")
+    login_robinhood()
 
     new_data = {
         "date": today_str,
         "options": []
     }
 
+    contracts = []
     if json_data:
-        for row in json_data:
-            symbol = row["Symbol"]
-            if symbol == "AS":
-                continue
-
-            preMarketPrice = row["Premkt. Price"]
-            stock = yf.Ticker(symbol)
-
-            if not stock.options:
-                continue
-            
-            options = stock.option_chain(stock.options[0])
-            calls = options.calls
-            call_option = calls.iloc[(calls['strike'] - float(preMarketPrice.replace(',', ''))).abs().argsort()[:1]]        
-            target_strike = call_option['strike'].iloc[0]
-            target_expiration = datetime.strptime(stock.options[0], '%Y-%m-%d').strftime('%Y-%m-%d')
-            
-            target_expiration_date = datetime.strptime(target_expiration, '%Y-%m-%d')
-            today = datetime.today()
-            difference = (target_expiration_date - today).days
-
-            if difference > 6:
-                continue
-
-            try:
-                stock_close_price = r.get_stock_quote_by_symbol(symbol)['previous_close']
-                current_stock_price = r.get_latest_price(symbol)[0]
-                options = r.find_options_by_expiration_and_strike(symbol, target_expiration, target_strike, optionType='call')
-                option_market_close = options[0]["previous_close_price"] 
-
-            except:
-                print(f"Error fetching data for {symbol}")
-                continue
-
-            print(f'\n\nStock price at market close: {stock_close_price} for {symbol}')
-            print(f'Stock price before market open: {current_stock_price} for {symbol}')
-            print(f'Option price at market close: {option_market_close} for {symbol}')
-
-            option_id = f"{symbol} ${target_strike} Call {target_expiration}"
-
-            # get time now
-            now = datetime.now()
-            time_difference = timedelta(hours=-7)
-            
-            # Adjust the current time by the time difference
-            now = now + time_difference
-            new_data["options"].append({
-                "id": option_id,
-                "percentage": 0,
-                "time": now.strftime("%Y-%m-%d %H:%M:%S"),
-            })
-
+        contracts = enrich_screener_rows(json_data)
+        # Persist the contract -> instrument id map for the polling loops
+        save_instrument_ids()
+        # Keep the screener rows and cached chains so backtest.py can replay today
+        save_screener_snapshot(today_str, json_data, {row['Symbol']: cached_chain(row['Symbol']) for row in json_data})
     else:
         print("No data found")
-    
-    update_firestore_with_new_data(today_str, new_data["options"])
 
-    for option in new_data["options"]:
-        test_symbol = option["id"].split()[0]
-        test_expiration = option["id"].split()[3]
-        test_strike = float(option["id"].split()[1].replace('$', ''))
+    # get time now (Pacific)
+    now = now_pacific()
 
-        try:
-            track_market_data(test_symbol, test_expiration, test_strike, duration=12, sleep_interval=2)
-        except Exception as e:
-            print(f"Error tracking market data for {test_symbol}: {e}")
+    # Contracts only become id strings here, at the Firestore boundary
+    new_data["options"] = [{
+        "id": contract.id,
+        "percentage": 0,
+        "time": now.strftime("%Y-%m-%d %H:%M:%S"),
+    } for contract in contracts]
 
-        print("Done")
-        
-        break # For testing purposes we only need to track one option
+    update_firestore_with_new_data(today_str, new_data["options"])
+
+    recorder = TickRecorder(today_str, 'live')
+    try:
+        track_market_data(contracts, duration=LIVE_TRACK_DURATION, sleep_interval=LIVE_SAMPLE_INTERVAL, recorder=recorder)
+    finally:
+        recorder.close()
+    print("Done")
 
 ###################################################
 ############## ROBINHOOD CODE #####################
 ###################################################
 
-def get_high_option_price(symbol, exp_date, strike):
-    options = r.find_options_by_expiration_and_strike(symbol, exp_date, strike, optionType='call')
-
-    if not options:
-        return None
-
-    # Get option id
-    option_id = options[0]['id']
-
-    # Get market data
-    market_data = r.get_option_market_data_by_id(option_id)
-
-    # Get the high_price from the market data
-    high_price = market_data[0].get('high_price')
-
-    return float(high_price.replace(',', '')) if high_price else None
+def check_and_update_high_price(session_duration=None):
+    login_robinhood()
 
-def check_and_update_high_price():
-    # Reference to Firestore collection and document
-    doc_ref = db.collection('options_data').order_by('date', direction=firestore.Query.DESCENDING).limit(1)
-    docs = doc_ref.stream()
+    # Newest day, found through the summary document rather than a collection query
+    last_doc = latest_options_doc(get_db())
 
-    last_doc = None
-    for doc in docs:
-        last_doc = doc.to_dict()
+    # Without today's picks (the morning run failed) the newest document is an earlier
+    # day's, whose opening bars would never match today's
+    today = datetime.today().strftime('%Y-%m-%d')
+    if last_doc and last_doc['date'] != today:
+        print(f"Latest picks are from {last_doc['date']}, not {today}. Exiting...")
+        return
 
     if last_doc:
         date = last_doc['date']
-        new_options = []
-
-        # Wait until 6:30 AM PST
-        while True:
-            now = datetime.now(timezone.utc) - timedelta(hours=7)  # Convert UTC to PST
-            if now.hour == 6 and now.minute >= 31:
-                print("Not 6:30am yet. Waiting...")
-                break
-            time.sleep(30)  # Sleep for 30sec before checking again
+        # Finish syncing earlier days, then pick today's state back up from the journal
+        replay_leftovers('YahooOptions', update_firestore_with_new_data, skip_date=date)
+        journal = HighJournal(date, 'YahooOptions', lambda options: update_firestore_with_new_data(date, options))
+        recorder = TickRecorder(date, 'YahooOptions')
+        tracker = HighPriceTracker(last_doc['options'], date, recorder, journal.state())
+
+        if not tracker:
+            print("Nothing to update today. Exiting...")
+            journal.close()
+            return
+
+        # Polling only appends to the journal; Firestore is written from the background
+        journal.start()
+
+        # Start at 6:31 AM PST (9:31 ET), whatever the DST offset, and stop session_duration
+        # (SESSION_DURATION, 1.5 hours, by default) later
+        open_time = market_open_at()
+        start_time = open_time + timedelta(minutes=1)
+        sleep_until(start_time)
+        session_end = max(start_time, datetime.now(MARKET_TZ)) + (session_duration or SESSION_DURATION)
 
-        start_time = datetime.now()
-
-        while True:
-            # Check if 3 hours and 30 minutes have passed
-            elapsed_time = datetime.now() - start_time
-            if elapsed_time > timedelta(hours=1, minutes=30):
-                break
-
-            if not last_doc['options']:
-                print("Nothing to update today. Exiting...")
-                break
-
-            for option in last_doc['options']:
-                # Regex the option details from string format "SMCI $1040.0 Call 2024-03-08"
-                option_string = option['id']
-
-                match = re.match(r"(\w+)\s+\$(\d+\.\d+)\s+(\w+)\s+(\d{4}-\d{2}-\d{2})", option_string)
-
-                if match:
-                    symbol = match.group(1)
-                    strike = float(match.group(2).replace(',', ''))
-                    option_type = match.group(3)
-                    exp_date = match.group(4)
-
-                    # Get raw open price
-                    raw_open_price_data = r.get_option_historicals(symbol, exp_date, strike, option_type, interval='5minute', span='day')
-                    if not raw_open_price_data:
-                        print(f"Could not fetch historical data for {symbol} {strike} {exp_date}")
-                        continue
-
-                    # Convert open price to float
-                    open_price = float(raw_open_price_data[0]["open_price"].replace(',', ''))
-
-                    # Get high price
-                    high_price = get_high_option_price(symbol, exp_date, strike)
-                    if high_price is None:
-                        print(f"No registered trades for {symbol} {strike} {exp_date}")
-                        continue
-
-                    if high_price > open_price:
-                        percentage = round((high_price - open_price) / open_price * 100, 2)
-                        if percentage > option['percentage']:
-                            option['percentage'] = percentage
-                            option['high_price'] = high_price
-                            option['open_price'] = open_price
-                            print(f"Updating high price for {symbol} {strike} {exp_date} to {high_price} with a percentage of {percentage}%")
-                            new_options.append(option)
-                        else:
-                            print(f"No update for {symbol} {strike} {exp_date} as the high price is {high_price} and the open price is {open_price}")
-                    else:
-                        print(f"No update for {symbol} {strike} {exp_date} as the high price is {high_price} and the open price is {open_price}")
-
-            if new_options:
-                update_firestore_with_new_data(date, new_options)
-
-            # Wait for a minute before the next check
-            time.sleep(10)
-            print("\n\n\n\n")
+        try:
+            run_polling_session(tracker, session_end, journal.append, open_time)
+        finally:
+            journal.close()
+            recorder.close()
 
 if __name__ == "__main__":
+    print("Starting at time: ", datetime.now())
+    start_metrics_export()
     fetch_and_calculate_option_price()
     check_and_update_high_price()
@@ -0,0 +1,308 @@
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import datetime, time as dtime
+import numpy as np
+from chainCache import CHAIN_COLUMNS
+from chainScoring import MAX_PICKS_PER_SYMBOL, PICK_TOP_K, score_chains, stack_candidates, top_contracts
+from optionContract import WIN_THRESHOLD, compute_new_highs, parse_price
+from scheduler import MARKET_TZ
+from screener import MAX_DAYS_TO_EXPIRY, MIN_MARKET_CAP, MIN_PREMARKET_CHANGE
+
+# Replays the premarket-gapper selection over recorded days. Each day's recorded chains
+# are scored once with the live chain scoring (chainScoring.py), which gives every
+# candidate its best contract and a rank within the day; the grid then picks the top K
+# ranked candidates that pass each combination's screen. Every candidate across all
+# days is one row of flat arrays, and a whole parameter grid is evaluated as
+# (combinations x candidates) array operations.
+#
+# Snapshots only hold rows that already passed the live screen (filtered server side),
+# and chains are only fetched for front expiries within MAX_DAYS_TO_EXPIRY, so the grid
+# can only tighten the screen; looser values would silently match the live thresholds
+# and are dropped.
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+GRID_CHUNK = 256
+
+# When the morning run scores chains, for snapshots that don't record it
+SNAPSHOT_TIME = dtime(9, 10)
+
+# Combinations where fewer of the picks have a recorded outcome are ranked last, since
+# their mean only covers the few contracts that happened to be tracked
+MIN_COVERAGE = 0.8
+
+# Symbols the live run never trades
+EXCLUDED_SYMBOLS = {'AS'}
+
+def parse_market_cap(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    multipliers = {'T': 1e12, 'B': 1e9, 'M': 1e6}
+    value = value.strip()
+    if value and value[-1] in multipliers:
+        return parse_price(value[:-1]) * multipliers[value[-1]]
+    return parse_price(value)
+
+def _json_column(values):
+    return [None if np.isnan(value) else float(value) for value in values]
+
+def save_screener_snapshot(date, rows, chains, directory=SNAPSHOT_DIR):
+    # chains: {symbol: (expirations, front-expiry call chain or None)}, as cached by the morning run.
+    # The whole chain is kept so the replay can rerun the live scoring.
+    candidates = []
+    for row in rows:
+        expirations, chain = chains.get(row['Symbol'], ((), None))
+        days_to_expiry = (datetime.strptime(expirations[0], '%Y-%m-%d') - datetime.strptime(date, '%Y-%m-%d')).days if expirations else None
+        change = row.get('Premkt. Chg.')
+        candidates.append({
+            'symbol': row['Symbol'],
+            'market_cap': parse_market_cap(row['Market Cap']),
+            'premarket_change': parse_price(change.rstrip('%')) if change else None,
+            'premarket_price': parse_price(row['Premkt. Price']),
+            'expiration': expirations[0] if expirations else None,
+            'days_to_expiry': days_to_expiry,
+            'strikes': chain['strike'].tolist() if chain is not None else [],
+            'chain': {column: _json_column(chain[column]) for column in CHAIN_COLUMNS} if chain is not None else None,
+        })
+
+    # The screen the rows passed, which bounds what a replay can loosen
+    screen = {'min_market_cap': MIN_MARKET_CAP, 'min_premarket_change': MIN_PREMARKET_CHANGE, 'max_days_to_expiry': MAX_DAYS_TO_EXPIRY}
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{date}.json"), 'w') as f:
+        json.dump({'date': date, 'taken_at': datetime.now(MARKET_TZ).isoformat(), 'screen': screen, 'candidates': candidates}, f, indent=4)
+
+def load_snapshots(directory=SNAPSHOT_DIR):
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path, 'r') as f:
+            snapshots.append(json.load(f))
+    return snapshots
+
+def _add_outcomes(outcomes, day):
+    for option in day.get('options', []):
+        if option.get('open_price') is not None and option.get('high_price') is not None:
+            outcomes[option['id']] = (option['open_price'], option['high_price'])
+
+def load_outcomes(paths):
+    # Realized open/high per contract id from exported day documents (same shape as the
+    # Firestore options_data documents). Only days tracked since open_price/high_price
+    # were stored carry them; older exports like options_data_*.json have none.
+    outcomes = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            for day in json.load(f):
+                _add_outcomes(outcomes, day)
+    return outcomes
+
+def load_firestore_outcomes():
+    # Same, read straight from the options_data collection
+    from services import get_db
+
+    outcomes = {}
+    for doc in get_db().collection('options_data').stream():
+        _add_outcomes(outcomes, doc.to_dict() or {})
+    return outcomes
+
+def screen_bounds(snapshots):
+    # Tightest screen any snapshot was taken under; older snapshots used the live one
+    default = {'min_market_cap': MIN_MARKET_CAP, 'min_premarket_change': MIN_PREMARKET_CHANGE, 'max_days_to_expiry': MAX_DAYS_TO_EXPIRY}
+    screens = [snapshot.get('screen', default) for snapshot in snapshots] or [default]
+    return {
+        'min_market_cap': max(screen['min_market_cap'] for screen in screens),
+        'min_premarket_change': max(screen['min_premarket_change'] for screen in screens),
+        'max_days_to_expiry': min(screen['max_days_to_expiry'] for screen in screens),
+    }
+
+def _tightening(name, values, bound, looser):
+    kept = [value for value in values if not looser(value, bound)]
+    dropped = [value for value in values if looser(value, bound)]
+    if dropped:
+        print(f"Dropping {name} values {dropped}: looser than the recorded screen ({bound:g})")
+    return kept or [bound]
+
+def _snapshot_time(snapshot):
+    if snapshot.get('taken_at'):
+        return datetime.fromisoformat(snapshot['taken_at'])
+    return datetime.combine(datetime.strptime(snapshot['date'], '%Y-%m-%d').date(), SNAPSHOT_TIME, tzinfo=MARKET_TZ)
+
+def _candidate_chain(candidate):
+    # Older snapshots only kept strikes; with no quotes the scoring falls back to the
+    # nearest strike, the rule those days were picked by
+    chain = candidate.get('chain') or {'strike': candidate['strikes']}
+    size = len(chain['strike'])
+    return {column: np.asarray(chain[column], dtype=np.float64) if column in chain else np.full(size, np.nan) for column in CHAIN_COLUMNS}
+
+def rank_day(snapshot):
+    # Live scoring over one day's chains: {candidate position: (pick strike column, rank in the day)}
+    scored = [(position, candidate) for position, candidate in enumerate(snapshot['candidates'])
+              if candidate['symbol'] not in EXCLUDED_SYMBOLS and candidate['strikes'] and candidate.get('premarket_price') and candidate.get('expiration')]
+    stacked = stack_candidates([(candidate['symbol'], candidate['expiration'], candidate['premarket_price'], _candidate_chain(candidate)) for _, candidate in scored], _snapshot_time(snapshot))
+    if stacked is None:
+        return {}
+
+    scores = score_chains(stacked)
+    starts = np.searchsorted(stacked['symbol_index'], np.arange(len(scored)))
+    picks = top_contracts(stacked, scores, top_k=len(scored), per_symbol=1)
+    return {scored[stacked['symbol_index'][row]][0]: (int(row - starts[stacked['symbol_index'][row]]), rank) for rank, (_, _, _, row) in enumerate(picks)}
+
+def build_dataset(snapshots, outcomes):
+    # Flatten to one row per candidate that the scoring picks a contract for, in day and
+    # rank order, with (candidates x strikes) open/high matrices
+    candidates = []
+    for day_index, snapshot in enumerate(snapshots):
+        ranked = rank_day(snapshot)
+        day = sorted((rank, column, snapshot['candidates'][position]) for position, (column, rank) in ranked.items())
+        candidates.extend((day_index, column, candidate) for _, column, candidate in day)
+    count = len(candidates)
+    width = max([len(candidate['strikes']) for _, _, candidate in candidates] + [1])
+
+    dataset = {
+        'day': np.empty(count, dtype=np.int32),
+        'market_cap': np.full(count, np.nan),
+        'premarket_change': np.full(count, np.nan),
+        'days_to_expiry': np.full(count, np.nan),
+        'pick_index': np.empty(count, dtype=np.int32),
+        'strike_count': np.zeros(count, dtype=np.int32),
+        'opens': np.full((count, width), np.nan),
+        'highs': np.full((count, width), np.nan),
+        'days': len(snapshots),
+    }
+
+    for row, (day_index, column, candidate) in enumerate(candidates):
+        dataset['day'][row] = day_index
+        dataset['pick_index'][row] = column
+        dataset['strike_count'][row] = len(candidate['strikes'])
+        for field in ('market_cap', 'premarket_change', 'days_to_expiry'):
+            if candidate.get(field) is not None:
+                dataset[field][row] = candidate[field]
+
+        for strike_column, strike in enumerate(candidate['strikes']):
+            outcome = outcomes.get(f"{candidate['symbol']} ${float(strike)} Call {candidate['expiration']}")
+            if outcome:
+                dataset['opens'][row, strike_column], dataset['highs'][row, strike_column] = outcome
+
+    return dataset
+
+def parameter_grid(min_market_cap=(2e9,), min_premarket_change=(8.0,), max_days_to_expiry=(6,), strike_offset=(0,)):
+    mesh = np.meshgrid(min_market_cap, min_premarket_change, max_days_to_expiry, strike_offset, indexing='ij')
+    names = ('min_market_cap', 'min_premarket_change', 'max_days_to_expiry', 'strike_offset')
+    return {name: axis.ravel() for name, axis in zip(names, mesh)}
+
+def _evaluate(dataset, grid, win_threshold, top_k):
+    # Screen mask for every (combination, candidate) pair at once
+    selected = (
+        (dataset['market_cap'][None, :] >= grid['min_market_cap'][:, None])
+        & (dataset['premarket_change'][None, :] >= grid['min_premarket_change'][:, None])
+        & (dataset['days_to_expiry'][None, :] <= grid['max_days_to_expiry'][:, None])
+    )
+
+    # Rows are in rank order within each day, so the day's top K among the candidates a
+    # combination keeps are the ones whose running count within the day is <= K
+    day_starts = np.flatnonzero(np.r_[True, np.diff(dataset['day']) != 0]) if len(dataset['day']) else np.zeros(0, dtype=int)
+    if len(day_starts):
+        running = np.cumsum(selected, axis=1)
+        before_day = np.where(day_starts > 0, running[:, np.maximum(day_starts - 1, 0)], 0)
+        day_of_row = np.repeat(np.arange(len(day_starts)), np.diff(np.r_[day_starts, len(dataset['day'])]))
+        selected &= running - before_day[:, day_of_row] <= top_k
+
+    # Chosen strike column per combination: the scored pick shifted by the offset
+    columns = dataset['pick_index'][None, :] + grid['strike_offset'].astype(np.int32)[:, None]
+    in_chain = (columns >= 0) & (columns < dataset['strike_count'][None, :])
+    selected &= in_chain
+    columns = np.clip(columns, 0, dataset['opens'].shape[1] - 1)
+
+    rows = np.arange(len(dataset['day']))[None, :]
+    opens = dataset['opens'][rows, columns]
+    highs = dataset['highs'][rows, columns]
+
+    # Same rule as check_and_update_high_price: gain from open to high, 0 if it never traded above the open
+    percentages, above_open = compute_new_highs(opens, highs, np.zeros_like(opens))
+    percentages = np.where(above_open, percentages, 0.0)
+    evaluated = selected & ~np.isnan(opens) & ~np.isnan(highs)
+
+    picks = selected.sum(axis=1)
+    evaluated_count = evaluated.sum(axis=1)
+    hits = (evaluated & (percentages > win_threshold)).sum(axis=1)
+    total = np.where(evaluated, percentages, 0.0).sum(axis=1)
+
+    # Candidates are stored day by day, so per-day pick counts are one segmented sum
+    if len(day_starts):
+        days_with_picks = (np.add.reduceat(selected, day_starts, axis=1) > 0).sum(axis=1)
+    else:
+        days_with_picks = np.zeros(len(picks), dtype=int)
+
+    return picks, evaluated_count, hits, total, days_with_picks
+
+def run_backtest(dataset, grid, win_threshold=WIN_THRESHOLD, top_k=PICK_TOP_K):
+    # Combinations are evaluated GRID_CHUNK at a time to bound the (combinations x candidates) arrays
+    size = len(grid['strike_offset'])
+    results = [np.zeros(size, dtype=np.int64) for _ in range(3)] + [np.zeros(size), np.zeros(size, dtype=np.int64)]
+
+    for start in range(0, size, GRID_CHUNK):
+        chunk = {name: axis[start:start + GRID_CHUNK] for name, axis in grid.items()}
+        for result, values in zip(results, _evaluate(dataset, chunk, win_threshold, top_k)):
+            result[start:start + GRID_CHUNK] = values
+
+    picks, evaluated_count, hits, total, days_with_picks = results
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'picks': picks,
+            'evaluated': evaluated_count,
+            'hits': hits,
+            'hit_rate': np.where(evaluated_count > 0, hits / evaluated_count, np.nan),
+            'mean_percentage': np.where(evaluated_count > 0, total / evaluated_count, np.nan),
+            'days_with_picks': days_with_picks,
+            'coverage': np.where(picks > 0, evaluated_count / picks, 0.0),
+        }
+
+def _axis(values, cast=float):
+    return [cast(value) for value in values.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the premarket-gapper selection over recorded snapshots.")
+    parser.add_argument('--snapshots', default=SNAPSHOT_DIR)
+    parser.add_argument('--outcomes', nargs='*', default=[], help="Exported day documents; read from Firestore when omitted")
+    parser.add_argument('--market-caps', default='2e9,5e9,10e9,20e9')
+    parser.add_argument('--premarket-changes', default='8,10,12,15')
+    parser.add_argument('--max-days', default='2,4,6')
+    parser.add_argument('--strike-offsets', default='-2,-1,0,1,2')
+    parser.add_argument('--top-k', type=int, default=PICK_TOP_K, help="Contracts picked per day, as PICK_TOP_K in the live run")
+    parser.add_argument('--min-coverage', type=float, default=MIN_COVERAGE, help="Share of picks that need a recorded outcome to rank a combination")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    snapshots = load_snapshots(args.snapshots)
+    outcomes = load_outcomes(args.outcomes) if args.outcomes else load_firestore_outcomes()
+    if not outcomes:
+        print("No contracts with open_price/high_price found, nothing can be evaluated")
+
+    bounds = screen_bounds(snapshots)
+    market_caps = _tightening('market cap', _axis(args.market_caps), bounds['min_market_cap'], lambda value, bound: value < bound)
+    premarket_changes = _tightening('premarket change', _axis(args.premarket_changes), bounds['min_premarket_change'], lambda value, bound: value < bound)
+    max_days = _tightening('max days to expiry', _axis(args.max_days, int), bounds['max_days_to_expiry'], lambda value, bound: value > bound)
+
+    dataset = build_dataset(snapshots, outcomes)
+    grid = parameter_grid(market_caps, premarket_changes, max_days, _axis(args.strike_offsets, int))
+
+    start = time.monotonic()
+    results = run_backtest(dataset, grid, top_k=args.top_k)
+    print(f"Evaluated {len(grid['strike_offset'])} combinations over {dataset['days']} days / {len(dataset['day'])} candidates in {time.monotonic() - start:.3f}s")
+    if MAX_PICKS_PER_SYMBOL != 1:
+        print(f"Note: the replay picks one contract per symbol, the live run allows {MAX_PICKS_PER_SYMBOL}")
+
+    # Covered combinations first, then by mean gain
+    covered = results['coverage'] >= args.min_coverage
+    ranked = np.lexsort((-np.nan_to_num(results['mean_percentage'], nan=-np.inf), ~covered))[:args.top]
+    for i in ranked:
+        print(
+            f"cap>={grid['min_market_cap'][i] / 1e9:g}B chg>={grid['min_premarket_change'][i]:g}% "
+            f"dte<={grid['max_days_to_expiry'][i]:g} offset={grid['strike_offset'][i]:+d}: "
+            f"{results['picks'][i]} picks, {results['evaluated'][i]} evaluated ({results['coverage'][i]:.0%}), "
+            f"hit rate {results['hit_rate'][i]:.1%}, mean {results['mean_percentage'][i]:.2f}%"
+            + ("" if covered[i] else " [low coverage]")
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import math
+import random
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime, timedelta
+
+# In-process stand-ins for robin_stocks.robinhood, yfinance, firebase_admin and the
+# screener, installed into sys.modules before YahooOptions is imported. Every call goes
+# through FakeNetwork, which adds latency/jitter, injects errors and counts calls.
+
+class FakeNetworkError(Exception):
+    pass
+
+class FakeNetwork:
+    def __init__(self, latency=0.02, jitter=0.01, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def call(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors[endpoint] += 1
+        time.sleep(delay)
+        if failed:
+            raise FakeNetworkError(f"Injected failure for {endpoint}")
+
+class FakeResponse:
+    def __init__(self, status_code, data, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+def _price(value):
+    return f"{value:,.4f}"
+
+class FakeMarket:
+    # Deterministic option prices: each instrument opens somewhere in 1-5 and its day
+    # high ratchets up over time
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.opens = {}
+        self.highs = {}
+
+    def open_price(self, instrument_id):
+        with self.lock:
+            if instrument_id not in self.opens:
+                self.opens[instrument_id] = self.random.uniform(1, 5)
+            return self.opens[instrument_id]
+
+    def high_price(self, instrument_id):
+        open_price = self.open_price(instrument_id)
+        with self.lock:
+            high = max(self.highs.get(instrument_id, open_price), open_price * self.random.uniform(0.9, 1.05))
+            self.highs[instrument_id] = high
+            return high
+
+STOCK_QUOTE = {'previous_close': '100.0000', 'last_trade_price': '100.0000', 'last_extended_hours_trade_price': '108.0000'}
+
+def instrument_id_for(symbol, exp_date, strike):
+    return f"{symbol}-{exp_date}-{float(strike)}"
+
+def _robinhood_modules(network, market):
+    robinhood = types.ModuleType('robin_stocks.robinhood')
+    helper = types.ModuleType('robin_stocks.robinhood.helper')
+    urls = types.ModuleType('robin_stocks.robinhood.urls')
+
+    def login(*args, **kwargs):
+        network.call('robinhood.login')
+        return {'access_token': 'fake', 'token_type': 'Bearer', 'expires_in': 86400}
+
+    def request_get(url, dataType='regular', payload=None, jsonify_data=True):
+        if not jsonify_data:
+            # Raw responses: injected failures come back as transient server errors, which the
+            # gateway retries without slowing the endpoint down as it would for a 429
+            try:
+                data = request_get(url, 'regular', payload)
+            except FakeNetworkError:
+                return FakeResponse(503, None)
+            return FakeResponse(200, data)
+
+        if url.endswith('/quotes/'):
+            network.call('robinhood.stock_quote')
+            return {'results': [dict(STOCK_QUOTE, symbol=payload['symbols'])]}
+
+        if url.endswith('/options/instruments/'):
+            network.call('robinhood.find_options')
+            symbol, exp_date = payload['chain_symbol'], payload['expiration_dates']
+            instrument_id = instrument_id_for(symbol, exp_date, payload['strike_price'])
+            return {'results': [{'id': instrument_id, 'expiration_date': exp_date, 'strike_price': payload['strike_price'], 'type': payload['type']}], 'next': None}
+
+        if url.endswith('/instruments/'):
+            network.call('robinhood.instruments')
+            return {'results': [{'symbol': payload['symbol'], 'tradable_chain_id': f"chain-{payload['symbol']}"}]}
+
+        if '/historicals/' in url:
+            network.call('robinhood.option_historicals')
+            instrument_id = url.rstrip('/').split('/')[-1]
+            begins_at = datetime.now().strftime('%Y-%m-%dT14:30:00Z')
+            return {'data_points': [{'begins_at': begins_at, 'open_price': _price(market.open_price(instrument_id))}]}
+
+        if url.endswith('/marketdata/options/'):
+            network.call('robinhood.option_market_data')
+            results = []
+            for instrument in payload['instruments'].split(','):
+                instrument_id = instrument.rstrip('/').split('/')[-1]
+                high = market.high_price(instrument_id)
+                results.append({
+                    'instrument': instrument,
+                    'instrument_id': instrument_id,
+                    'high_price': _price(high),
+                    'last_trade_price': _price(high * 0.97),
+                    'bid_price': _price(high * 0.96),
+                    'ask_price': _price(high * 0.98),
+                    'mark_price': _price(high * 0.97),
+                })
+            return results if dataType == 'results' else {'results': results}
+
+        raise ValueError(f"Unexpected fake Robinhood URL: {url}")
+
+    def _safe(endpoint_function, fallback):
+        # robin_stocks logs request failures and hands back None instead of raising
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint_function(*args, **kwargs)
+            except FakeNetworkError:
+                return fallback
+        return wrapper
+
+    robinhood.login = login
+    helper.request_get = _safe(request_get, None)
+
+    urls.option_historicals_url = lambda id: f"https://api.robinhood.com/marketdata/options/historicals/{id}/"
+    urls.option_instruments_url = lambda id=None: f"https://api.robinhood.com/options/instruments/{id}/" if id else "https://api.robinhood.com/options/instruments/"
+    urls.quotes_url = lambda: "https://api.robinhood.com/quotes/"
+    urls.instruments_url = lambda: "https://api.robinhood.com/instruments/"
+    urls.marketdata_options_url = lambda: "https://api.robinhood.com/marketdata/options/"
+
+    robinhood.helper = helper
+    robinhood.urls = urls
+    package = types.ModuleType('robin_stocks')
+    package.robinhood = robinhood
+    return {'robin_stocks': package, 'robin_stocks.robinhood': robinhood, 'robin_stocks.robinhood.helper': helper, 'robin_stocks.robinhood.urls': urls}
+
+def _yfinance_module(network):
+    yfinance = types.ModuleType('yfinance')
+    front_expiry = (datetime.today() + timedelta(days=2)).strftime('%Y-%m-%d')
+    next_expiry = (datetime.today() + timedelta(days=9)).strftime('%Y-%m-%d')
+
+    class FakeChain:
+        def __init__(self, strikes):
+            # Intrinsic value plus a bell of time value around a 100 underlying, quoted 4% wide
+            prices = [max(100 - strike, 0) + 3 * math.exp(-((strike - 100) / 8) ** 2) + 0.05 for strike in strikes]
+            self.calls = {
+                'strike': strikes,
+                'bid': [price * 0.98 for price in prices],
+                'ask': [price * 1.02 for price in prices],
+                'lastPrice': prices,
+                'volume': [int(1000 * math.exp(-abs(strike - 100) / 10)) for strike in strikes],
+                'openInterest': [int(5000 * math.exp(-abs(strike - 100) / 15)) for strike in strikes],
+                'impliedVolatility': [0.6] * len(strikes),
+            }
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        @property
+        def options(self):
+            network.call('yfinance.options')
+            return (front_expiry, next_expiry)
+
+        def option_chain(self, expiration):
+            network.call('yfinance.option_chain')
+            # Strikes every 2.5 around a 100 underlying
+            return FakeChain([50 + 2.5 * i for i in range(41)])
+
+    yfinance.Ticker = Ticker
+    return {'yfinance': yfinance}
+
+# Stand-in for firestore.DELETE_FIELD
+DELETE_FIELD = object()
+
+def _merged(existing, data):
+    # set(..., merge=True): nested maps merge key by key, DELETE_FIELD removes a key
+    result = dict(existing)
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            result.pop(key, None)
+        elif isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merged(result[key], value)
+        elif isinstance(value, dict):
+            result[key] = _merged({}, value)
+        else:
+            result[key] = value
+    return result
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+class FakeDocument:
+    def __init__(self, collection, name):
+        self.store = collection.store
+        self.documents = collection.documents
+        self.name = name
+
+    def get(self, transaction=None):
+        self.store.network.call('firestore.get')
+        return FakeSnapshot(self.documents.get(self.name))
+
+    def set(self, data, merge=False):
+        self.store.network.call('firestore.set')
+        self.documents[self.name] = _merged(self.documents.get(self.name) or {}, data) if merge else _merged({}, data)
+
+class FakeQuery:
+    def __init__(self, collection, field=None, descending=False, limit=None):
+        self.collection, self.field, self.descending, self.count = collection, field, descending, limit
+
+    def limit(self, count):
+        return FakeQuery(self.collection, self.field, self.descending, count)
+
+    def stream(self):
+        self.collection.store.network.call('firestore.query')
+        documents = list(self.collection.documents.values())
+        if self.field:
+            documents.sort(key=lambda data: data[self.field], reverse=self.descending)
+        return [FakeSnapshot(data) for data in documents[:self.count]]
+
+class FakeCollection:
+    def __init__(self, store):
+        self.store = store
+        self.documents = {}
+
+    def document(self, name):
+        return FakeDocument(self, name)
+
+    def order_by(self, field, direction='ASCENDING'):
+        return FakeQuery(self, field, direction == 'DESCENDING')
+
+    def stream(self):
+        return FakeQuery(self).stream()
+
+class FakeTransaction:
+    def __init__(self, store):
+        self.store = store
+
+    def set(self, doc_ref, data, merge=False):
+        doc_ref.set(data, merge)
+
+    def update(self, doc_ref, fields):
+        self.store.network.call('firestore.update')
+        doc_ref.documents[doc_ref.name].update(fields)
+
+class FakeFirestore:
+    def __init__(self, network):
+        self.network = network
+        self.collections = {}
+
+    def collection(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self)
+        return self.collections[name]
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+def _firebase_modules(network):
+    firebase_admin = types.ModuleType('firebase_admin')
+    credentials = types.ModuleType('firebase_admin.credentials')
+    firestore = types.ModuleType('firebase_admin.firestore')
+    client = FakeFirestore(network)
+
+    credentials.Certificate = lambda info: info
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: client
+    firestore.transactional = lambda function: function
+    firestore.DELETE_FIELD = DELETE_FIELD
+    firestore.Query = types.SimpleNamespace(DESCENDING='DESCENDING', ASCENDING='ASCENDING')
+
+    firebase_admin.credentials = credentials
+    firebase_admin.firestore = firestore
+    return {'firebase_admin': firebase_admin, 'firebase_admin.credentials': credentials, 'firebase_admin.firestore': firestore}
+
+def _misc_modules():
+    dotenv = types.ModuleType('dotenv')
+    dotenv.load_dotenv = lambda *args, **kwargs: None
+    pyotp = types.ModuleType('pyotp')
+    pyotp.TOTP = lambda key: types.SimpleNamespace(now=lambda: '000000')
+    return {'dotenv': dotenv, 'pyotp': pyotp}
+
+def screener_payload(count, seed=0):
+    # Recorded-screener shaped payload with `count` gappers that all pass the screen
+    rng = random.Random(seed)
+    records = [{
+        's': f"SYM{i:04d}",
+        'n': f"Fake Company {i}",
+        'marketCap': rng.uniform(2.5e9, 5e11),
+        'premarketChangePercent': rng.uniform(8.5, 30),
+        'premarketPrice': rng.uniform(90, 110),
+        'close': 100.0,
+    } for i in range(count)]
+    return {'status': 200, 'data': {'data': records, 'resultsCount': count}}
+
+def install(network, market=None):
+    market = market or FakeMarket()
+    modules = {}
+    modules.update(_robinhood_modules(network, market))
+    modules.update(_yfinance_module(network))
+    modules.update(_firebase_modules(network))
+    modules.update(_misc_modules())
+    sys.modules.update(modules)
+    return modules
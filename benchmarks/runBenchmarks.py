@@ -0,0 +1,186 @@
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# End-to-end benchmark of the morning run and the intraday high tracker against the
+# in-process fakes in fakeServices.py. Each scale runs in its own subprocess so caches
+# and peak memory don't leak between scales.
+#
+#   python benchmarks/runBenchmarks.py --scales 10,100,1000 --latency 0.02 --error-rate 0.01
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path[:0] = [REPO_DIR, BENCHMARK_DIR]
+
+def _timed(stats, name, function):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats[name].append(time.perf_counter() - start)
+    return wrapper
+
+def _summary(samples):
+    if not samples:
+        return {'calls': 0, 'total_s': 0.0, 'mean_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'calls': len(samples),
+        'total_s': round(sum(samples), 4),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+    }
+
+def run_scale(candidates, latency, jitter, error_rate, session_seconds):
+    import fakeServices
+
+    workdir = tempfile.mkdtemp(prefix='quinoptions-bench-')
+    os.chdir(workdir)
+    fixture_path = os.path.join(workdir, 'screener.json')
+    with open(fixture_path, 'w') as f:
+        json.dump(fakeServices.screener_payload(candidates), f)
+
+    os.environ.update({
+        'SCREENER_SOURCE': 'fixture',
+        'SCREENER_FIXTURE': fixture_path,
+        # One contract per candidate, so the tracked set grows with the scale
+        'PICK_TOP_K': str(candidates),
+        'MAX_PICKS_PER_SYMBOL': '1',
+        'FIREBASE_SERVICE_ACCOUNT_KEY': base64.b64encode(b'{}').decode('utf-8'),
+        'ROBIN_MFA': 'fake',
+        'ROBIN_USERNAME': 'fake',
+        'ROBIN_PASSWORD': 'fake',
+    })
+
+    network = fakeServices.FakeNetwork(latency=latency, jitter=jitter, error_rate=error_rate)
+    fakeServices.install(network)
+
+    tracemalloc.start()
+    stats = defaultdict(list)
+    start = time.perf_counter()
+    import YahooOptions
+    import highTracker
+    import scheduler
+    stats['import'].append(time.perf_counter() - start)
+
+    # Compress the session: short live tracking and polling windows, no wait for the open
+    YahooOptions.LIVE_TRACK_DURATION = 1
+    YahooOptions.LIVE_SAMPLE_INTERVAL = 0.25
+    YahooOptions.SESSION_DURATION = timedelta(seconds=session_seconds)
+    YahooOptions.market_open_at = lambda day=None: datetime.now(scheduler.MARKET_TZ) - timedelta(minutes=1)
+    YahooOptions.sleep_until = lambda deadline: None
+    scheduler.MIN_POLL_INTERVAL = 0.25
+    scheduler.BASE_POLL_INTERVAL = 0.5
+    scheduler.MAX_POLL_INTERVAL = 2
+    scheduler.COALESCE_WINDOW = 0.05
+
+    for name in ('get_screener_rows', 'enrich_screener_rows', 'update_firestore_with_new_data', 'track_market_data', 'run_polling_session'):
+        setattr(YahooOptions, name, _timed(stats, name, getattr(YahooOptions, name)))
+    highTracker.HighPriceTracker.poll = _timed(stats, 'tick', highTracker.HighPriceTracker.poll)
+
+    # How many contracts each stage actually ended up with, which the timings alone hide
+    counts = {'picks': 0, 'tracked_live': 0, 'tracked_session': 0}
+    enrich, track, tracker_init = YahooOptions.enrich_screener_rows, YahooOptions.track_market_data, highTracker.HighPriceTracker.__init__
+
+    def counted_enrich(rows):
+        contracts = enrich(rows)
+        counts['picks'] = len(contracts)
+        return contracts
+
+    def counted_track(contracts, *args, **kwargs):
+        counts['tracked_live'] = sum(1 for contract in contracts if contract.instrument_id)
+        return track(contracts, *args, **kwargs)
+
+    def counted_tracker_init(self, *args, **kwargs):
+        tracker_init(self, *args, **kwargs)
+        counts['tracked_session'] = len(self.options)
+
+    YahooOptions.enrich_screener_rows = counted_enrich
+    YahooOptions.track_market_data = counted_track
+    highTracker.HighPriceTracker.__init__ = counted_tracker_init
+
+    # The scripts print per contract; keep the report readable
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    failures = {}
+    try:
+        for name, stage in (('fetch_and_calculate_option_price', YahooOptions.fetch_and_calculate_option_price), ('check_and_update_high_price', YahooOptions.check_and_update_high_price)):
+            try:
+                _timed(stats, name, stage)()
+            except Exception as e:
+                # Injected errors that escape a stage are part of the result, not a harness crash
+                failures[name] = repr(e)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    import metrics
+
+    _, peak = tracemalloc.get_traced_memory()
+    return {
+        'candidates': candidates,
+        'stages': {name: _summary(samples) for name, samples in stats.items()},
+        'api_calls': dict(network.calls),
+        'api_errors': dict(network.errors),
+        'failures': failures,
+        'contracts': counts,
+        'dropped_lookups': dict(YahooOptions.enrichment_drops),
+        'metrics': metrics.snapshot(),
+        'peak_python_mb': round(peak / 2**20, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+def print_report(result):
+    print(f"\n=== {result['candidates']} candidates ===")
+    for name, summary in result['stages'].items():
+        print(f"  {name:<36} {summary['calls']:>5} calls  {summary['total_s']:>9.3f}s total  {summary['mean_ms']:>9.2f}ms mean  {summary['max_ms']:>9.2f}ms max")
+    print("  API calls: " + ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(result['api_calls'].items())))
+    if result['api_errors']:
+        print("  API errors: " + ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(result['api_errors'].items())))
+    counts = result['contracts']
+    print(f"  Contracts: {counts['picks']} picked, {counts['tracked_live']} tracked live, {counts['tracked_session']} tracked in the session")
+    for stage, drops in result['dropped_lookups'].items():
+        print(f"  Dropped {stage} lookups: {drops['timed_out']} timed out, {drops['failed']} failed of {drops['lookups']}")
+    for name, error in result['failures'].items():
+        print(f"  {name} FAILED: {error}")
+    print(f"  Peak Python memory {result['peak_python_mb']} MB, max RSS {result['max_rss_mb']} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the morning run and intraday tracker against local fakes.")
+    parser.add_argument('--scales', default='10,100,1000')
+    parser.add_argument('--latency', type=float, default=0.02, help="Mean seconds per fake API call")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--session-seconds', type=float, default=5)
+    parser.add_argument('--output', help="Write all results as JSON")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_scale(args.worker, args.latency, args.jitter, args.error_rate, args.session_seconds)))
+        return
+
+    results = []
+    for scale in (int(value) for value in args.scales.split(',')):
+        command = [sys.executable, os.path.abspath(__file__), '--worker', str(scale), '--latency', str(args.latency), '--jitter', str(args.jitter), '--error-rate', str(args.error_rate), '--session-seconds', str(args.session_seconds)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        # Lookups abandoned at a deadline may still print after the result line
+        result = json.loads(next(line for line in reversed(output.splitlines()) if line.startswith('{"candidates"')))
+        print_report(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import threading
+import time
+import numpy as np
+from metrics import timed
+
+# yfinance expiration lists and call chains, reused for CHAIN_TTL seconds. Expirations
+# are cheap and checked first, so whole chains are only downloaded for symbols we keep.
+CHAIN_TTL = 300
+
+_lock = threading.Lock()
+# yfinance keeps a Ticker's expirations for the object's lifetime, so the Ticker expires too
+_tickers = {}  # symbol -> (created_at, yf.Ticker)
+_expirations = {}  # symbol -> (fetched_at, expirations)
+_call_chains = {}  # (symbol, expiration) -> (fetched_at, {column: array sorted by strike})
+
+# Calls DataFrame columns kept for scoring; missing ones come back as NaN
+CHAIN_COLUMNS = ('strike', 'bid', 'ask', 'lastPrice', 'volume', 'openInterest', 'impliedVolatility')
+
+def _fresh(entry):
+    return entry is not None and time.monotonic() - entry[0] < CHAIN_TTL
+
+def _ticker(symbol):
+    import yfinance as yf # type: ignore
+
+    with _lock:
+        entry = _tickers.get(symbol)
+        if not _fresh(entry):
+            entry = _tickers[symbol] = (time.monotonic(), yf.Ticker(symbol))
+        return entry[1]
+
+def get_expirations(symbol):
+    with _lock:
+        entry = _expirations.get(symbol)
+    if _fresh(entry):
+        return entry[1]
+
+    with timed('yfinance.options'):
+        expirations = tuple(_ticker(symbol).options)
+    with _lock:
+        _expirations[symbol] = (time.monotonic(), expirations)
+    return expirations
+
+def _chain_arrays(calls):
+    size = len(calls['strike'])
+    chain = {column: np.asarray(calls[column], dtype=np.float64) if column in calls else np.full(size, np.nan) for column in CHAIN_COLUMNS}
+    order = np.argsort(chain['strike'], kind='stable')
+    return {column: values[order] for column, values in chain.items()}
+
+def get_call_chain(symbol, expiration):
+    # The whole calls table as flat arrays, so scoring needs no second download
+    key = (symbol, expiration)
+    with _lock:
+        entry = _call_chains.get(key)
+    if _fresh(entry):
+        return entry[1]
+
+    with timed('yfinance.option_chain'):
+        calls = _ticker(symbol).option_chain(expiration).calls
+    chain = _chain_arrays(calls)
+    with _lock:
+        _call_chains[key] = (time.monotonic(), chain)
+    return chain
+
+def cached_chain(symbol):
+    # Whatever is already cached for a symbol, without touching the network
+    with _lock:
+        expirations = _expirations.get(symbol)
+        expirations = expirations[1] if expirations else ()
+        chain = _call_chains.get((symbol, expirations[0])) if expirations else None
+    return expirations, chain[1] if chain else None
+
+def prune_chain_caches():
+    # For long-running processes: drop stale tickers, expirations and chains
+    with _lock:
+        for cache in (_tickers, _expirations, _call_chains):
+            for key in [key for key, entry in cache.items() if not _fresh(entry)]:
+                del cache[key]
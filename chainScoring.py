@@ -0,0 +1,207 @@
+import os
+from datetime import datetime, time as dtime
+import numpy as np
+from scheduler import MARKET_TZ
+
+# Ranks every front-expiry call of every gapper in one pass. All candidates' chains are
+# stacked into flat arrays (one row per strike, plus the row's symbol index), implied
+# volatility and Black-Scholes greeks are solved for all rows at once, and the score is
+# the option's leverage on a continued gap (delta * spot / price) discounted for thin or
+# wide markets.
+
+# How many contracts go into the day's options, and how many of them one symbol may take
+PICK_TOP_K = int(os.getenv('PICK_TOP_K', '10'))
+MAX_PICKS_PER_SYMBOL = int(os.getenv('MAX_PICKS_PER_SYMBOL', '1'))
+
+RISK_FREE_RATE = 0.05
+MARKET_CLOSE = dtime(16, 0)
+MIN_YEARS = 1 / (365 * 24)
+
+# Contracts outside these bounds are never picked
+MIN_OPTION_PRICE = 0.05
+MAX_MONEYNESS = 0.10
+MIN_DELTA = 0.25
+MAX_DELTA = 0.80
+MAX_SPREAD = 0.50
+
+# Liquidity discount: spread relative to mid, and volume + open interest against this scale
+SPREAD_SCALE = 0.10
+LIQUIDITY_SCALE = 200.0
+# Premarket quotes are often empty (bid/ask 0 at 9:10 ET), so an unknown spread costs
+# this much instead. Such rows are priced at the premarket spot with the provider's IV:
+# their lastPrice is the previous session's and would mis-price every gapper.
+UNKNOWN_SPREAD_FACTOR = 0.5
+# Provider IVs below this are placeholders (Yahoo fills in 1e-5, 0.0625, ...), not data
+MIN_PROVIDER_IV = 0.05
+
+# Picks are ranked by tier first and score within a tier. A model price is only as good
+# as the provider's IV, so unquoted rows never compete with quoted ones on elasticity and
+# are scored on liquidity and moneyness alone; a gapper with no eligible row falls back to its nearest
+# strike rather than dropping out.
+TIER_QUOTED = 2
+TIER_UNQUOTED = 1
+TIER_NEAREST_STRIKE = 0
+
+IV_MIN = 0.01
+IV_MAX = 5.0
+IV_ITERATIONS = 20
+
+_SQRT_2PI = np.sqrt(2 * np.pi)
+
+def _norm_pdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+def _norm_cdf(x):
+    # Abramowitz & Stegun 7.1.26 erf (|error| < 1.5e-7), no scipy needed
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+def _d1_d2(spot, strike, years, vol, rate):
+    vol_sqrt_t = vol * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+def call_price(spot, strike, years, vol, rate=RISK_FREE_RATE):
+    d1, d2 = _d1_d2(spot, strike, years, vol, rate)
+    return spot * _norm_cdf(d1) - strike * np.exp(-rate * years) * _norm_cdf(d2)
+
+def implied_volatility(price, spot, strike, years, rate=RISK_FREE_RATE):
+    # Newton steps from the Brenner-Subrahmanyam guess, clamped to [IV_MIN, IV_MAX].
+    # Prices outside the no-arbitrage bounds come back as NaN.
+    intrinsic = np.maximum(spot - strike * np.exp(-rate * years), 0)
+    valid = (price > intrinsic) & (price < spot)
+    vol = np.clip(np.sqrt(2 * np.pi / years) * price / spot, IV_MIN, IV_MAX)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(IV_ITERATIONS):
+            d1, _ = _d1_d2(spot, strike, years, vol, rate)
+            vega = spot * _norm_pdf(d1) * np.sqrt(years)
+            step = (call_price(spot, strike, years, vol, rate) - price) / vega
+            vol = np.clip(vol - np.where(np.isfinite(step), step, 0), IV_MIN, IV_MAX)
+
+    return np.where(valid, vol, np.nan)
+
+def call_greeks(spot, strike, years, vol, rate=RISK_FREE_RATE):
+    # Delta, gamma, theta per calendar day and vega per volatility point
+    d1, d2 = _d1_d2(spot, strike, years, vol, rate)
+    pdf = _norm_pdf(d1)
+    sqrt_t = np.sqrt(years)
+    return {
+        'delta': _norm_cdf(d1),
+        'gamma': pdf / (spot * vol * sqrt_t),
+        'theta': (-spot * pdf * vol / (2 * sqrt_t) - rate * strike * np.exp(-rate * years) * _norm_cdf(d2)) / 365,
+        'vega': spot * pdf * sqrt_t / 100,
+    }
+
+def years_to_expiry(expiration, now=None):
+    now = now or datetime.now(MARKET_TZ)
+    expires_at = datetime.combine(datetime.strptime(expiration, '%Y-%m-%d').date(), MARKET_CLOSE, tzinfo=MARKET_TZ)
+    return max(MIN_YEARS, (expires_at - now).total_seconds() / (365 * 24 * 3600))
+
+def stack_candidates(candidates, now=None):
+    # candidates: [(symbol, expiration, spot, chain)] with chain as chainCache.get_call_chain returns it
+    symbols, expirations = [], []
+    columns = {column: [] for column in ('strike', 'bid', 'ask', 'lastPrice', 'volume', 'openInterest', 'impliedVolatility')}
+    row_symbol, spots, years = [], [], []
+
+    for index, (symbol, expiration, spot, chain) in enumerate(candidates):
+        size = len(chain['strike'])
+        symbols.append(symbol)
+        expirations.append(expiration)
+        for column, values in columns.items():
+            values.append(chain[column])
+        row_symbol.append(np.full(size, index))
+        spots.append(np.full(size, float(spot)))
+        years.append(np.full(size, years_to_expiry(expiration, now)))
+
+    if not symbols:
+        return None
+
+    stacked = {column: np.concatenate(values) for column, values in columns.items()}
+    stacked.update(symbol_index=np.concatenate(row_symbol), spot=np.concatenate(spots), years=np.concatenate(years))
+    stacked['symbols'] = symbols
+    stacked['expirations'] = expirations
+    return stacked
+
+def _nearest_strike_rows(stacked):
+    # Per symbol, the row whose strike is closest to spot (ties to the lower strike)
+    symbol_index = stacked['symbol_index']
+    distance = np.abs(stacked['strike'] - stacked['spot'])
+    order = np.lexsort((stacked['strike'], distance, symbol_index))
+    grouped = symbol_index[order]
+    return order[np.concatenate(([True], grouped[1:] != grouped[:-1]))] if len(order) else order
+
+def score_chains(stacked, rate=RISK_FREE_RATE):
+    spot, strike, years = stacked['spot'], stacked['strike'], stacked['years']
+    bid, ask = stacked['bid'], stacked['ask']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quoted = (bid > 0) & (ask >= bid)
+        provider_vol = np.where(stacked['impliedVolatility'] >= MIN_PROVIDER_IV, stacked['impliedVolatility'], np.nan)
+        mid = np.where(quoted, (bid + ask) / 2, call_price(spot, strike, years, provider_vol, rate))
+        spread = np.where(quoted, (ask - bid) / mid, np.nan)
+
+        vol = np.where(quoted, implied_volatility(mid, spot, strike, years, rate), np.nan)
+        # Fall back to the provider's IV where there is no quote or ours can't be solved
+        vol = np.where(np.isfinite(vol), vol, provider_vol)
+        greeks = call_greeks(spot, strike, years, vol, rate)
+        elasticity = greeks['delta'] * spot / mid
+
+        activity = np.nan_to_num(stacked['volume']) + np.nan_to_num(stacked['openInterest'])
+        spread_factor = np.where(np.isfinite(spread), 1 / (1 + spread / SPREAD_SCALE), UNKNOWN_SPREAD_FACTOR)
+        liquidity = spread_factor * (1 - np.exp(-activity / LIQUIDITY_SCALE))
+
+        eligible = (
+            (mid >= MIN_OPTION_PRICE)
+            & (np.abs(strike / spot - 1) <= MAX_MONEYNESS)
+            & (greeks['delta'] >= MIN_DELTA) & (greeks['delta'] <= MAX_DELTA)
+            & ~(spread > MAX_SPREAD)
+            & np.isfinite(elasticity)
+        )
+        # Unquoted rows: liquidity, nudged towards the money, nothing that leans on the IV
+        unquoted_score = liquidity * (1 - np.abs(strike / spot - 1))
+        score = np.where(eligible, np.where(quoted, elasticity * liquidity, unquoted_score), -np.inf)
+
+    tier = np.where(eligible, np.where(quoted, TIER_QUOTED, TIER_UNQUOTED), -1)
+    has_eligible = np.bincount(stacked['symbol_index'], weights=eligible, minlength=len(stacked['symbols'])) > 0
+    nearest = _nearest_strike_rows(stacked)
+    fallback = nearest[~has_eligible[stacked['symbol_index'][nearest]]]
+    tier[fallback] = TIER_NEAREST_STRIKE
+    score[fallback] = 0.0
+
+    return {'score': score, 'tier': tier, 'price': mid, 'spread': spread, 'iv': vol, 'liquidity': liquidity, **greeks}
+
+def top_contracts(stacked, scores, top_k=PICK_TOP_K, per_symbol=MAX_PICKS_PER_SYMBOL):
+    # Best rows overall by (tier, score), at most per_symbol per symbol.
+    # Returns [(symbol, expiration, strike, row)].
+    score, tier = scores['score'], scores['tier']
+    symbol_index = stacked['symbol_index']
+
+    # Rank within each symbol: sort by (symbol, -tier, -score), then position minus the group start
+    order = np.lexsort((-score, -tier, symbol_index))
+    grouped = symbol_index[order]
+    starts = np.searchsorted(grouped, grouped, side='left')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order)) - starts
+
+    eligible = np.flatnonzero((tier >= TIER_NEAREST_STRIKE) & (rank < per_symbol))
+    best = eligible[np.lexsort((-score[eligible], -tier[eligible]))][:top_k]
+    return [(stacked['symbols'][symbol_index[row]], stacked['expirations'][symbol_index[row]], float(stacked['strike'][row]), row) for row in best]
+
+def rank_candidates(candidates, top_k=PICK_TOP_K, per_symbol=MAX_PICKS_PER_SYMBOL, now=None):
+    stacked = stack_candidates(candidates, now)
+    if stacked is None:
+        return []
+    scores = score_chains(stacked)
+    picks = top_contracts(stacked, scores, top_k, per_symbol)
+
+    for symbol, expiration, strike, row in picks:
+        if scores['tier'][row] == TIER_NEAREST_STRIKE:
+            print(f"No eligible {symbol} contract, falling back to the nearest strike {strike} {expiration}")
+            continue
+        print(f"Scored {symbol} {strike} {expiration}: score {scores['score'][row]:.2f}, price {scores['price'][row]:.2f}, "
+              f"IV {scores['iv'][row]:.2f}, delta {scores['delta'][row]:.2f}, spread {scores['spread'][row]:.2%}")
+    return [(symbol, expiration, strike) for symbol, expiration, strike, _ in picks]
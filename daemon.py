@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, time as dtime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import YahooOptions
+from metrics import snapshot, start_metrics_export
+from optionCache import prune_caches
+from scheduler import MARKET_TZ, is_trading_day, market_open_at, next_trading_day, sleep_until
+from services import get_db, login_robinhood
+
+# One resident process for both daily phases. The Robinhood session, Firestore client,
+# yfinance tickers and instrument/open-price caches stay warm between trading days, and
+# the single high tracker session covers what appUpdater.py polled separately.
+
+HEALTH_HOST = os.getenv('DAEMON_HEALTH_HOST', '127.0.0.1')
+HEALTH_PORT = int(os.getenv('DAEMON_HEALTH_PORT', '8787'))
+
+# Premarket pick time (ET), where the 14:10 UTC workflow lands in winter
+FETCH_TIME = dtime(9, 10)
+# Long enough to cover appUpdater's 3.5 hour window
+SESSION_DURATION = timedelta(hours=3, minutes=30)
+
+_state_lock = threading.Lock()
+_state = {
+    'phase': 'starting',
+    'started_at': datetime.now(MARKET_TZ).isoformat(),
+    'next_run': None,
+    'trading_day': None,
+    'runs': {},
+    'errors': 0,
+}
+
+def set_state(**fields):
+    with _state_lock:
+        _state.update(fields)
+
+def status():
+    with _state_lock:
+        state = json.loads(json.dumps(_state))
+    state['uptime_s'] = round(time.time() - datetime.fromisoformat(state['started_at']).timestamp(), 3)
+    return state
+
+class HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            body = {'ok': True, 'phase': status()['phase']}
+        elif self.path == '/status':
+            body = status()
+        elif self.path == '/metrics':
+            body = snapshot()
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body, indent=4).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Health checks would drown out the session logs
+        pass
+
+def start_health_server(host=HEALTH_HOST, port=HEALTH_PORT):
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    threading.Thread(target=server.serve_forever, name='health', daemon=True).start()
+    print(f"Health endpoint on http://{host}:{port}/status")
+    return server
+
+def next_run_at(now=None):
+    # Today's premarket slot if it's a trading day and the bell hasn't rung, else the next trading day's
+    now = now or datetime.now(MARKET_TZ)
+    day = now.date()
+    if not is_trading_day(day) or now >= market_open_at(day):
+        day = next_trading_day(day)
+    return max(now, datetime.combine(day, FETCH_TIME, tzinfo=MARKET_TZ))
+
+def run_phase(name, function, *args):
+    set_state(phase=name)
+    start = time.time()
+    try:
+        function(*args)
+        result = 'ok'
+    except Exception as e:
+        traceback.print_exc()
+        result = f"error: {e}"
+
+    with _state_lock:
+        _state['runs'][name] = {
+            'at': datetime.fromtimestamp(start, MARKET_TZ).isoformat(),
+            'seconds': round(time.time() - start, 3),
+            'result': result,
+        }
+        if result != 'ok':
+            _state['errors'] += 1
+    return result == 'ok'
+
+def run_trading_day():
+    set_state(trading_day=datetime.now(MARKET_TZ).date().isoformat())
+
+    # Both are no-ops while warm; the login only happens again once the token expires
+    # The session polls the day's picks, so it only runs after they were made
+    if run_phase('connect', lambda: (login_robinhood(), get_db())):
+        if run_phase('fetch', YahooOptions.fetch_and_calculate_option_price):
+            run_phase('check', YahooOptions.check_and_update_high_price, SESSION_DURATION)
+
+    prune_caches()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the daily pick and high tracking sessions from one resident process.")
+    parser.add_argument('--host', default=HEALTH_HOST)
+    parser.add_argument('--port', type=int, default=HEALTH_PORT)
+    parser.add_argument('--now', action='store_true', help="Run a session immediately instead of waiting for the calendar")
+    parser.add_argument('--once', action='store_true', help="Exit after one session")
+    args = parser.parse_args()
+
+    start_metrics_export()
+    start_health_server(args.host, args.port)
+
+    run_now = args.now
+    while True:
+        if not run_now:
+            next_run = next_run_at()
+            set_state(phase='waiting', next_run=next_run.isoformat())
+            sleep_until(next_run)
+        run_now = False
+
+        set_state(next_run=None)
+        run_trading_day()
+        if args.once:
+            break
+
+    set_state(phase='stopped')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import threading
+from metrics import timed
+from optionContract import WIN_THRESHOLD
+
+# Fields each writer owns on an option entry. YahooOptions tracks the full high/open
+# state, appUpdater only ever touched the percentage.
+OPTION_FIELDS = ('percentage', 'high_price', 'open_price')
+
+# Precomputed documents so clients read one small document instead of the whole
+# options_data collection: options_summary/latest holds the newest SUMMARY_DAYS days by
+# date (option ids and percentages best first, plus the day's top pick) and rolling
+# statistics, options_summary/daily one small aggregate per trading day, for the last
+# DAILY_DAYS days, to roll them from. Both are written field by field, only when the
+# day's aggregate or page changed.
+SUMMARY_COLLECTION = 'options_summary'
+SUMMARY_DAYS = 10
+ROLLING_WINDOWS = (5, 20, 60)
+DAILY_DAYS = max(ROLLING_WINDOWS)
+
+_lock = threading.Lock()
+# date -> {option id: option as last written}, so unchanged ticks never reach Firestore
+_written = {}
+# options_summary/daily as last read or written, read once per process
+_daily = None
+# date -> latest page entry as last written
+_pages = {}
+
+def _changed_options(date, new_options, fields):
+    written = _written.get(date, {})
+    changed = {}
+
+    for new_option in new_options:
+        option_id = new_option['id']
+        last = written.get(option_id)
+        if last is None or any(field in new_option and new_option[field] != last.get(field) for field in fields):
+            changed[option_id] = dict(new_option)
+
+    return changed
+
+def _merge_options(existing_options, changed, fields):
+    # Single pass over the stored array, indexed by id instead of a nested scan
+    merged = [dict(option) for option in existing_options]
+    index = {option['id']: i for i, option in enumerate(merged)}
+
+    for option_id, new_option in changed.items():
+        if option_id in index:
+            merged[index[option_id]].update({field: new_option[field] for field in fields if field in new_option})
+        else:
+            index[option_id] = len(merged)
+            merged.append(new_option)
+
+    return merged
+
+def _percentage(option):
+    return float(option.get('percentage') or 0)
+
+def _day_aggregate(options):
+    top = max(options, key=_percentage) if options else None
+    return {
+        'picks': len(options),
+        'wins': sum(1 for option in options if _percentage(option) > WIN_THRESHOLD),
+        'gain_sum': round(sum(_percentage(option) for option in options), 4),
+        'top_pick': {'id': top['id'], 'percentage': _percentage(top)} if top else None,
+    }
+
+def _rolling_stats(daily):
+    dates = sorted(daily, reverse=True)
+    stats = {}
+    for window in ROLLING_WINDOWS:
+        days = [daily[date] for date in dates[:window]]
+        picks = sum(day['picks'] for day in days)
+        stats[f'{window}d'] = {
+            'days': len(days),
+            'picks': picks,
+            'win_rate': round(sum(day['wins'] for day in days) / picks * 100, 2) if picks else None,
+            'average_gain': round(sum(day['gain_sum'] for day in days) / picks, 2) if picks else None,
+        }
+    return stats
+
+def _page_entry(options, aggregate):
+    # Full option fields stay in the day document; the page is the sorted index
+    ranked = sorted(options, key=_percentage, reverse=True)
+    return {'options': [{'id': option['id'], 'percentage': _percentage(option)} for option in ranked], 'top_pick': aggregate['top_pick']}
+
+def _newest(dates, count):
+    return set(sorted(dates, reverse=True)[:count])
+
+def _summary_updates(daily, pages, date, options):
+    # Folds one day's options into the summary documents. Returns the new daily window
+    # and the merge writes for daily and latest (None when nothing changed).
+    from firebase_admin import firestore # type: ignore
+
+    aggregate = _day_aggregate(options)
+    entry = _page_entry(options, aggregate)
+    if daily.get(date) == aggregate and pages.get(date) == entry:
+        return daily, None, None
+
+    window = {day: daily[day] for day in _newest(set(daily) | {date}, DAILY_DAYS) if day != date}
+    window[date] = aggregate
+    daily_update = {date: aggregate, **{day: firestore.DELETE_FIELD for day in set(daily) - set(window)}}
+
+    dropped_pages = _newest(daily, SUMMARY_DAYS) - _newest(window, SUMMARY_DAYS)
+    latest_update = {
+        'latest_date': max(window),
+        'days': {date: entry, **{day: firestore.DELETE_FIELD for day in dropped_pages}},
+        'stats': _rolling_stats(window),
+    }
+    return window, daily_update, latest_update
+
+def _summary_refs(db):
+    summary = db.collection(SUMMARY_COLLECTION)
+    return summary.document('latest'), summary.document('daily')
+
+def _apply_changes(transaction, db, date, changed, fields, daily):
+    doc_ref = db.collection('options_data').document(date)
+    latest_ref, daily_ref = _summary_refs(db)
+
+    # Firestore transactions read everything before writing anything. The daily window
+    # is only read on a process's first write; after that it is kept in memory.
+    snapshot = doc_ref.get(transaction=transaction)
+    if daily is None:
+        daily_snapshot = daily_ref.get(transaction=transaction)
+        daily = (daily_snapshot.to_dict() or {}) if daily_snapshot.exists else {}
+
+    existing_options = (snapshot.to_dict() or {}).get('options', []) if snapshot.exists else []
+    merged = _merge_options(existing_options, changed, fields)
+
+    # A missing day document is still created, even with no options, so the tracker
+    # finds today's (empty) picks instead of the previous day's
+    if snapshot.exists and merged == existing_options:
+        return merged, False, daily, None
+
+    if snapshot.exists:
+        transaction.update(doc_ref, {'options': merged})
+    else:
+        transaction.set(doc_ref, {'date': date, 'options': merged})
+
+    daily, daily_update, latest_update = _summary_updates(daily, _pages, date, merged)
+    if daily_update is not None:
+        transaction.set(daily_ref, daily_update, merge=True)
+        transaction.set(latest_ref, latest_update, merge=True)
+    return merged, True, daily, latest_update and latest_update['days'][date]
+
+def write_options(db, date, new_options, fields=OPTION_FIELDS):
+    # Coalesces a tick's option changes into at most one transactional update of the
+    # day document. Returns True if Firestore was written.
+    global _daily
+    with _lock:
+        changed = _changed_options(date, new_options, fields)
+        if not changed and date in _written:
+            return False
+
+        from firebase_admin import firestore # type: ignore
+
+        with timed('firestore.write_options'):
+            merged, wrote, daily, page = firestore.transactional(_apply_changes)(db.transaction(), db, date, changed, fields, _daily)
+        _daily = daily
+        if page is not None:
+            _pages[date] = page
+        _written[date] = {option['id']: dict(option) for option in merged}
+        # Only the current day is ever written again, matters for long-running processes
+        for cache in (_written, _pages):
+            for stale in sorted(cache)[:-2]:
+                del cache[stale]
+        return wrote
+
+def rebuild_summary(db):
+    # One full scan to backfill the summary documents (first run, or after manual edits)
+    global _daily
+    days = {}
+    with timed('firestore.rebuild_summary'):
+        for doc in db.collection('options_data').stream():
+            data = doc.to_dict() or {}
+            if data.get('date'):
+                days[data['date']] = data.get('options', [])
+
+        if not days:
+            return {}
+        daily = {date: _day_aggregate(days[date]) for date in _newest(days, DAILY_DAYS)}
+        latest = {
+            'latest_date': max(daily),
+            'days': {date: _page_entry(days[date], daily[date]) for date in _newest(daily, SUMMARY_DAYS)},
+            'stats': _rolling_stats(daily),
+        }
+        latest_ref, daily_ref = _summary_refs(db)
+        latest_ref.set(latest)
+        daily_ref.set(daily)
+
+    with _lock:
+        _daily = None
+        _pages.clear()
+    return latest
+
+def latest_options_doc(db):
+    # Newest day document via the summary index instead of an ordered collection query
+    latest_ref, _ = _summary_refs(db)
+    with timed('firestore.latest_doc'):
+        snapshot = latest_ref.get()
+        latest = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        if not latest.get('latest_date'):
+            latest = rebuild_summary(db)
+        if not latest.get('latest_date'):
+            return None
+
+        snapshot = db.collection('options_data').document(latest['latest_date']).get()
+        return snapshot.to_dict() if snapshot.exists else None
@@ -0,0 +1,170 @@
+import glob
+import json
+import os
+import threading
+import time
+from metrics import timed
+
+# Append-only local journal of tracked contract state (percentage, high and open price),
+# one JSON line per change under journal/<date>/<writer>.jsonl. The polling loop only
+# appends to it; a background thread replays the changes to Firestore, compacted by
+# contract id, and records how far it got in <writer>.synced. After a crash the tracker
+# rebuilds its state from the file and the unsynced tail is replayed on the next start.
+JOURNAL_DIR = os.getenv('JOURNAL_DIR', 'journal')
+JOURNAL_FIELDS = ('percentage', 'high_price', 'open_price')
+
+# fsync at most this often (seconds); a crash of the process alone loses nothing
+FSYNC_INTERVAL = 1.0
+
+# Replay cadence, backoff ceiling while Firestore is failing and how long closing waits
+# for the last write (seconds)
+REPLAY_INTERVAL = 2.0
+REPLAY_MAX_BACKOFF = 60.0
+DRAIN_TIMEOUT = 10.0
+
+def _journal_path(date, writer, directory=JOURNAL_DIR):
+    return os.path.join(directory, date, writer + '.jsonl')
+
+def _read_entries(path):
+    # Entries plus the byte length they cover, which stops short of a torn last line
+    entries = []
+    valid_bytes = 0
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+    except FileNotFoundError:
+        pass
+    return entries, valid_bytes
+
+def _read_checkpoint(path):
+    try:
+        with open(path, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def _merge(compacted, entry):
+    # Later fields win, fields an entry doesn't carry are kept from earlier ones
+    compacted[entry['id']] = {**compacted.get(entry['id'], {}), **entry}
+
+def _compact(entries):
+    compacted = {}
+    for entry in entries:
+        _merge(compacted, entry)
+    return compacted
+
+class HighJournal:
+    def __init__(self, date, writer, write_options=None, directory=JOURNAL_DIR):
+        self.path = _journal_path(date, writer, directory)
+        self.checkpoint_path = self.path[:-len('.jsonl')] + '.synced'
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        entries, valid_bytes = _read_entries(self.path)
+        self.seq = entries[-1]['seq'] if entries else 0
+        self.synced_seq = _read_checkpoint(self.checkpoint_path)
+        self.recovered = _compact(entries)
+        self.pending = _compact(entry for entry in entries if entry['seq'] > self.synced_seq)
+
+        # Cut a torn tail from a crash mid-write off before appending after it
+        if os.path.exists(self.path) and os.path.getsize(self.path) != valid_bytes:
+            os.truncate(self.path, valid_bytes)
+        self.file = open(self.path, 'a')
+        self.last_fsync = 0.0
+
+        self.lock = threading.Lock()
+        self.write_options = write_options
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        # Background replay to Firestore; the unsynced tail from a previous run goes first
+        if self.pending:
+            print(f"Replaying {len(self.pending)} journaled contract updates")
+        self.thread = threading.Thread(target=self._replay_loop, name='journal-replay', daemon=True)
+        self.thread.start()
+
+    def state(self):
+        # {option id: last journaled fields}, for HighPriceTracker to resume from
+        return {option_id: {field: entry[field] for field in JOURNAL_FIELDS if field in entry} for option_id, entry in self.recovered.items()}
+
+    def append(self, options):
+        # Called from the polling loop: a buffered write, and an fsync once per FSYNC_INTERVAL
+        with self.lock:
+            for option in options:
+                self.seq += 1
+                entry = {'seq': self.seq, 't': round(time.time(), 3), 'id': option['id']}
+                entry.update({field: option[field] for field in JOURNAL_FIELDS if field in option})
+                self.file.write(json.dumps(entry) + '\n')
+                _merge(self.recovered, entry)
+                _merge(self.pending, entry)
+
+            self.file.flush()
+            if time.time() - self.last_fsync >= FSYNC_INTERVAL:
+                os.fsync(self.file.fileno())
+                self.last_fsync = time.time()
+
+    def replay_once(self):
+        with self.lock:
+            if not self.pending:
+                return True
+            batch, self.pending = self.pending, {}
+            seq = self.seq
+
+        options = [{'id': entry['id'], **{field: entry[field] for field in JOURNAL_FIELDS if field in entry}} for entry in batch.values()]
+        try:
+            with timed('journal.replay'):
+                self.write_options(options)
+        except Exception as e:
+            print(f"Firestore replay failed, keeping {len(options)} updates journaled: {e}")
+            with self.lock:
+                # Anything journaled meanwhile is newer than the failed batch
+                for option_id, entry in batch.items():
+                    self.pending[option_id] = {**entry, **self.pending.get(option_id, {})}
+            return False
+
+        with self.lock:
+            self.synced_seq = max(self.synced_seq, seq)
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(self.synced_seq))
+            os.replace(tmp_path, self.checkpoint_path)
+        return True
+
+    def _replay_loop(self):
+        # One compacted write per interval, backing off while Firestore keeps failing.
+        # Closing wakes the wait up for a last attempt.
+        failures = 0
+        while not self.stopping.is_set():
+            self.stopping.wait(min(REPLAY_MAX_BACKOFF, REPLAY_INTERVAL * 2 ** failures))
+            failures = 0 if self.replay_once() else failures + 1
+
+    def close(self):
+        if self.thread:
+            self.stopping.set()
+            self.thread.join(DRAIN_TIMEOUT)
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+def replay_leftovers(writer, write_options, skip_date=None, directory=JOURNAL_DIR):
+    # Previous days' journals that closed with updates Firestore never acknowledged.
+    # write_options(date, options) raises on failure, which leaves the journal pending.
+    for path in sorted(glob.glob(os.path.join(directory, '*', writer + '.jsonl'))):
+        date = os.path.basename(os.path.dirname(path))
+        if date == skip_date:
+            continue
+        synced_seq = _read_checkpoint(path[:-len('.jsonl')] + '.synced')
+        entries, _ = _read_entries(path)
+        if not entries or entries[-1]['seq'] <= synced_seq:
+            continue
+
+        journal = HighJournal(date, writer, lambda options, date=date: write_options(date, options), directory)
+        if journal.replay_once():
+            print(f"Replayed journaled updates for {date}")
+        journal.close()
@@ -0,0 +1,112 @@
+import time
+import numpy as np
+from metrics import observe
+from optionCache import get_instrument_id, get_open_price
+from optionContract import OptionContract, OptionQuote, compute_new_highs
+from robinhoodApi import get_option_market_data_by_ids
+
+class HighPriceTracker:
+    # Per-contract state lives in flat NumPy arrays lined up with self.options, so a
+    # tick is one batched quote request plus one vectorized comparison.
+
+    def __init__(self, options, date, recorder=None, state=None):
+        self.date = date
+        self.recorder = recorder
+        self.options = []
+        self.contracts = []
+
+        # Parse "SMCI $1040.0 Call 2024-03-08" ids once instead of on every tick
+        for option in options:
+            contract = OptionContract.from_id(option['id'])
+            if not contract:
+                print(f"Could not parse option {option['id']}")
+                continue
+
+            contract.instrument_id = get_instrument_id(contract.symbol, contract.exp_date, contract.strike, contract.option_type)
+            if not contract.instrument_id:
+                print(f"Could not find instrument for {contract.symbol} {contract.strike} {contract.exp_date}")
+                continue
+
+            self.options.append(option)
+            self.contracts.append(contract)
+
+        self.instrument_ids = [contract.instrument_id for contract in self.contracts]
+        self.open_prices = np.full(len(self.contracts), np.nan)
+        self.high_prices = np.full(len(self.contracts), np.nan)
+        self.traded = np.zeros(len(self.contracts), dtype=bool)
+        self.rising = np.zeros(len(self.contracts), dtype=bool)
+        self.best_percentages = np.array([option.get('percentage', 0) for option in self.options], dtype=float)
+
+        if state:
+            self._resume(state)
+
+    def _resume(self, state):
+        # Journaled state (HighJournal.state()) from an earlier run today: newer than the
+        # Firestore doc if its writes were lost, and no API calls needed to rebuild it
+        for i, option in enumerate(self.options):
+            saved = state.get(option['id'])
+            if not saved:
+                continue
+            if saved.get('open_price') is not None:
+                self.open_prices[i] = saved['open_price']
+            if saved.get('high_price') is not None:
+                self.high_prices[i] = saved['high_price']
+            if saved.get('percentage', 0) > self.best_percentages[i]:
+                option.update(saved)
+                self.best_percentages[i] = saved['percentage']
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def _fill_open_prices(self, indices):
+        # Only contracts whose opening bar hasn't shown up yet go back to the cache/API
+        for i in indices[np.isnan(self.open_prices[indices])]:
+            open_price = get_open_price(self.instrument_ids[i], self.date)
+            if open_price is not None:
+                self.open_prices[i] = open_price
+
+    def _fill_high_prices(self, indices, market_data):
+        # Keeps the last known high for contracts missing from this batch
+        self.traded[indices] = False
+        for i in indices:
+            instrument_id = self.instrument_ids[i]
+            quote = OptionQuote.from_market_data(instrument_id, market_data.get(instrument_id))
+            if quote and self.recorder:
+                self.recorder.record(self.options[i]['id'], quote)
+            if quote and quote.high_price is not None:
+                self.high_prices[i] = quote.high_price
+                self.traded[i] = True
+
+    def poll(self, indices=None):
+        # One tick over the given contracts (all by default): returns the option dicts
+        # that reached a new high percentage
+        tick_start = time.perf_counter()
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=int)
+        previous_highs = self.high_prices[indices]
+
+        self._fill_open_prices(indices)
+        self._fill_high_prices(indices, get_option_market_data_by_ids([self.instrument_ids[i] for i in indices]))
+
+        # Day high only ever goes up, so any increase means the contract is still running
+        with np.errstate(invalid='ignore'):
+            self.rising[indices] = self.high_prices[indices] > previous_highs
+
+        percentages, new_highs = compute_new_highs(self.open_prices[indices], self.high_prices[indices], self.best_percentages[indices])
+
+        updated = []
+        for j in np.flatnonzero(new_highs):
+            i = indices[j]
+            option = self.options[i]
+            option['percentage'] = float(percentages[j])
+            option['high_price'] = float(self.high_prices[i])
+            option['open_price'] = float(self.open_prices[i])
+            self.best_percentages[i] = percentages[j]
+
+            contract = self.contracts[i]
+            print(f"Updating high price for {contract.symbol} {contract.strike} {contract.exp_date} to {option['high_price']} with a percentage of {option['percentage']}%")
+            updated.append(option)
+
+        missing = int(np.count_nonzero(np.isnan(self.open_prices[indices]) | ~self.traded[indices]))
+        print(f"Checked {len(indices)} contracts: {len(updated)} new highs, {missing} without open/high data yet")
+        observe('high_tracker.tick', time.perf_counter() - tick_start, kind='loop')
+        return updated
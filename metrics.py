@@ -0,0 +1,169 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Latency histograms, call/error/retry counts and call rates for every external API hop,
+# plus loop durations (per tick/round). Exported as JSON, or Prometheus text format
+# when METRICS_PATH ends in .prom.
+METRICS_PATH = os.getenv('METRICS_PATH', 'metrics.json')
+METRICS_EXPORT_INTERVAL = float(os.getenv('METRICS_EXPORT_INTERVAL', '60'))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+RATE_WINDOW = 60
+
+_lock = threading.Lock()
+_series = {}
+_started_at = time.time()
+_exporter = None
+
+class _Series:
+    def __init__(self, kind):
+        self.kind = kind
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque()
+        self.peak_per_window = 0
+
+    def observe(self, seconds, error, now):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+        # Calls in the trailing RATE_WINDOW seconds, to compare against provider limits
+        self.recent.append(now)
+        while self.recent and self.recent[0] < now - RATE_WINDOW:
+            self.recent.popleft()
+        self.peak_per_window = max(self.peak_per_window, len(self.recent))
+
+    def quantile(self, q):
+        # Upper bucket bound containing the q-th observation, capped at the largest seen
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+def _get_series(name, kind):
+    series = _series.get(name)
+    if series is None:
+        series = _series[name] = _Series(kind)
+    return series
+
+def observe(name, seconds, error=False, kind='api'):
+    with _lock:
+        _get_series(name, kind).observe(seconds, error, time.time())
+
+def record_retry(name):
+    with _lock:
+        _get_series(name, 'api').retries += 1
+
+class _Call:
+    __slots__ = ('error',)
+
+    def __init__(self):
+        self.error = False
+
+    def failed(self):
+        # For clients like robin_stocks that log and return None instead of raising
+        self.error = True
+
+@contextmanager
+def timed(name, kind='api'):
+    call = _Call()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.error = True
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, call.error, kind)
+
+def snapshot():
+    now = time.time()
+    with _lock:
+        result = {'uptime_s': round(now - _started_at, 3), 'api': {}, 'loop': {}}
+        for name, series in sorted(_series.items()):
+            while series.recent and series.recent[0] < now - RATE_WINDOW:
+                series.recent.popleft()
+            result[series.kind][name] = {
+                'count': series.count,
+                'total_s': round(series.total, 6),
+                'errors': series.errors,
+                'retries': series.retries,
+                'mean_ms': round(series.total / series.count * 1000, 2) if series.count else None,
+                'p50_ms': round(series.quantile(0.5) * 1000, 2) if series.count else None,
+                'p95_ms': round(series.quantile(0.95) * 1000, 2) if series.count else None,
+                'max_ms': round(series.max * 1000, 2),
+                'calls_last_minute': len(series.recent),
+                'peak_calls_per_minute': series.peak_per_window,
+                'buckets': {('+Inf' if bound == float('inf') else str(bound)): count for bound, count in zip(BUCKETS, series.buckets)},
+            }
+    return result
+
+def _prometheus(data):
+    lines = []
+    for kind, metric in (('api', 'quinoptions_api_latency_seconds'), ('loop', 'quinoptions_loop_duration_seconds')):
+        lines.append(f"# TYPE {metric} histogram")
+        for name, series in data[kind].items():
+            cumulative = 0
+            for bound, count in series['buckets'].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{name="{name}"}} {series["total_s"]}')
+            lines.append(f'{metric}_count{{name="{name}"}} {series["count"]}')
+
+    for field, metric in (('errors', 'quinoptions_api_errors_total'), ('retries', 'quinoptions_api_retries_total'), ('calls_last_minute', 'quinoptions_api_calls_last_minute')):
+        lines.append(f"# TYPE {metric} {'counter' if field != 'calls_last_minute' else 'gauge'}")
+        for name, series in data['api'].items():
+            lines.append(f'{metric}{{name="{name}"}} {series[field]}')
+    return '\n'.join(lines) + '\n'
+
+def export_metrics(path=None):
+    path = path or METRICS_PATH
+    data = snapshot()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(_prometheus(data))
+        else:
+            json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+def start_metrics_export(interval=None):
+    # Periodic export on a daemon thread, plus a final export when the process exits
+    global _exporter
+    if _exporter:
+        return
+    interval = METRICS_EXPORT_INTERVAL if interval is None else interval
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                export_metrics()
+            except OSError as e:
+                print(f"Could not export metrics: {e}")
+
+    _exporter = threading.Thread(target=run, name='metrics-export', daemon=True)
+    _exporter.start()
+    atexit.register(export_metrics)
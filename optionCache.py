@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+from datetime import datetime
+from chainCache import prune_chain_caches
+from metrics import record_retry
+from robinhoodApi import find_options, get_option_historicals_by_id
+from scheduler import MARKET_TZ
+
+# Contract -> Robinhood option instrument id. Ids never change for a listed contract,
+# so the morning picks fill this once and the polling loops just read it back.
+INSTRUMENT_CACHE_PATH = os.getenv('INSTRUMENT_CACHE_PATH', 'instrument_cache.json')
+
+# Trading date -> {instrument id: opening 5-minute bar open}. The opening bar never
+# changes once printed, so it is fetched once per contract per day and survives restarts.
+OPEN_PRICE_CACHE_PATH = os.getenv('OPEN_PRICE_CACHE_PATH', 'open_price_cache.json')
+
+_lock = threading.Lock()
+_instrument_ids = None
+_open_prices = None
+
+def _contract_key(symbol, exp_date, strike, option_type='call'):
+    return f"{symbol} {float(strike)} {option_type.lower()} {exp_date}"
+
+def _load_instrument_ids():
+    global _instrument_ids
+    if _instrument_ids is not None:
+        return _instrument_ids
+
+    try:
+        with open(INSTRUMENT_CACHE_PATH, 'r') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cached = {}
+
+    # Drop contracts that already expired so the file doesn't grow forever
+    _instrument_ids = _unexpired(cached)
+    return _instrument_ids
+
+def _unexpired(instrument_ids):
+    today = datetime.today().strftime('%Y-%m-%d')
+    return {key: value for key, value in instrument_ids.items() if key.split()[-1] >= today}
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+def save_instrument_ids():
+    with _lock:
+        instrument_ids = dict(_load_instrument_ids())
+
+    _write_json(INSTRUMENT_CACHE_PATH, instrument_ids)
+
+def remember_instrument_id(symbol, exp_date, strike, instrument_id, option_type='call'):
+    with _lock:
+        _load_instrument_ids()[_contract_key(symbol, exp_date, strike, option_type)] = instrument_id
+
+def get_instrument_id(symbol, exp_date, strike, option_type='call'):
+    key = _contract_key(symbol, exp_date, strike, option_type)
+    with _lock:
+        instrument_id = _load_instrument_ids().get(key)
+    if instrument_id:
+        return instrument_id
+
+    options = find_options(symbol, exp_date, strike, option_type.lower())
+    if not options:
+        return None
+
+    remember_instrument_id(symbol, exp_date, strike, options[0]['id'], option_type)
+    save_instrument_ids()
+    return options[0]['id']
+
+def _load_open_prices():
+    global _open_prices
+    if _open_prices is not None:
+        return _open_prices
+
+    try:
+        with open(OPEN_PRICE_CACHE_PATH, 'r') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cached = {}
+
+    # Only today's opens are ever useful again
+    today = datetime.today().strftime('%Y-%m-%d')
+    _open_prices = {today: cached.get(today, {})}
+    return _open_prices
+
+def _bar_date(begins_at):
+    # Bars are stamped in UTC ("2024-03-08T14:30:00Z"); the session date is New York's
+    if not begins_at:
+        return None
+    return datetime.fromisoformat(begins_at.replace('Z', '+00:00')).astimezone(MARKET_TZ).strftime('%Y-%m-%d')
+
+def get_open_price(instrument_id, trading_date=None):
+    trading_date = trading_date or datetime.today().strftime('%Y-%m-%d')
+    with _lock:
+        open_price = _load_open_prices().get(trading_date, {}).get(instrument_id)
+    if open_price is not None:
+        return open_price
+
+    # Opening bar not cached yet (or not printed yet), so ask again until it exists
+    raw_open_price_data = get_option_historicals_by_id(instrument_id, interval='5minute', span='day')
+    if not raw_open_price_data:
+        record_retry('robinhood.option_historicals')
+        return None
+
+    # Before the bell a 'day' span can still hold the previous session's bars, which
+    # must not be cached as today's open
+    first_bar = raw_open_price_data[0]
+    if _bar_date(first_bar.get('begins_at')) != trading_date:
+        record_retry('robinhood.option_historicals')
+        return None
+
+    open_price = float(first_bar["open_price"].replace(',', ''))
+    with _lock:
+        _load_open_prices().setdefault(trading_date, {})[instrument_id] = open_price
+        open_prices = {date: dict(prices) for date, prices in _open_prices.items()}
+
+    _write_json(OPEN_PRICE_CACHE_PATH, open_prices)
+    return open_price
+
+def prune_caches():
+    # For long-running processes: drop expired contracts and previous days' opens, which
+    # only happens at load time otherwise, and stale yfinance state
+    global _instrument_ids, _open_prices
+    today = datetime.today().strftime('%Y-%m-%d')
+    with _lock:
+        if _instrument_ids is not None:
+            _instrument_ids = _unexpired(_instrument_ids)
+        if _open_prices is not None:
+            _open_prices = {today: _open_prices.get(today, {})}
+    prune_chain_caches()
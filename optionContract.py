@@ -0,0 +1,74 @@
+import re
+import numpy as np
+
+# A pick counts as a win (and the app shows it green) above this gain over its open, in percent
+WIN_THRESHOLD = 30.0
+
+# Contracts travel through Firestore as "SMCI $1040.0 Call 2024-03-08"
+OPTION_ID_PATTERN = re.compile(r"(\w+)\s+\$([\d,]+\.\d+)\s+(\w+)\s+(\d{4}-\d{2}-\d{2})")
+
+def parse_price(value):
+    # Robinhood/screener prices come back as strings like "1,040.50"
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return float(value.replace(',', ''))
+    return float(value)
+
+class OptionContract:
+    # Parsed once at ingestion, serialized back to the id string only for Firestore
+    __slots__ = ('symbol', 'strike', 'option_type', 'exp_date', 'instrument_id')
+
+    def __init__(self, symbol, strike, option_type, exp_date, instrument_id=None):
+        self.symbol = symbol
+        self.strike = float(strike)
+        self.option_type = option_type
+        self.exp_date = exp_date
+        self.instrument_id = instrument_id
+
+    @classmethod
+    def from_id(cls, option_id):
+        match = OPTION_ID_PATTERN.match(option_id)
+        if not match:
+            return None
+        symbol, strike, option_type, exp_date = match.groups()
+        return cls(symbol, parse_price(strike), option_type, exp_date)
+
+    @property
+    def id(self):
+        return f"{self.symbol} ${self.strike} {self.option_type} {self.exp_date}"
+
+    def __repr__(self):
+        return f"OptionContract({self.id!r})"
+
+class OptionQuote:
+    __slots__ = ('instrument_id', 'last_trade_price', 'bid_price', 'ask_price', 'mark_price', 'high_price')
+
+    def __init__(self, instrument_id, last_trade_price, bid_price, ask_price, mark_price, high_price):
+        self.instrument_id = instrument_id
+        self.last_trade_price = last_trade_price
+        self.bid_price = bid_price
+        self.ask_price = ask_price
+        self.mark_price = mark_price
+        self.high_price = high_price
+
+    @classmethod
+    def from_market_data(cls, instrument_id, market_data):
+        if not market_data:
+            return None
+        return cls(
+            instrument_id,
+            parse_price(market_data.get('last_trade_price')),
+            parse_price(market_data.get('bid_price')),
+            parse_price(market_data.get('ask_price')),
+            parse_price(market_data.get('mark_price')),
+            parse_price(market_data.get('high_price')),
+        )
+
+def compute_new_highs(open_prices, high_prices, best_percentages):
+    # Percentage gain from open to high for every tracked contract at once. Contracts
+    # with no open/high yet are NaN and never count as a new high.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.round((high_prices - open_prices) / open_prices * 100, 2)
+    new_highs = (high_prices > open_prices) & (percentages > best_percentages)
+    return percentages, new_highs
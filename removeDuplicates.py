@@ -1,15 +1,121 @@
+import argparse
 import json
+import os
+import textwrap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-# Load the data from the file
-with open('options_data_2.json', 'r') as f:
-    data = json.load(f)
+# Compacts an option history export ([{date, options: [...]}, ...]) one date at a time:
+# options are deduplicated by contract id, the last write wins and each contract keeps
+# the position it was first picked at. Dates are streamed in and out, so memory stays
+# flat however many years the export covers.
 
-# Remove duplicates, keeping only the last occurrence
-for date in data:
-    date['options'].reverse()
-    date['options'] = [dict(t) for t in set(tuple(option.items()) for option in date['options'])]
-    date['options'].reverse()
+READ_CHUNK_SIZE = 1 << 20
 
-# Write the cleaned data to a new file
-with open('options_data_3.json', 'w') as f:
-    json.dump(data, f, indent=4)
\ No newline at end of file
+# Dates handed to the worker pool ahead of the writer, bounds memory with many workers
+MAX_PENDING_PER_WORKER = 4
+
+def iter_dates(path, chunk_size=READ_CHUNK_SIZE):
+    # Yields the top-level array elements without loading the whole array. Elements are
+    # decoded in place at a moving position; the consumed prefix is only trimmed when the
+    # next chunk is read, so each byte is copied a bounded number of times.
+    decoder = json.JSONDecoder()
+    skip = json.decoder.WHITESPACE.match
+    with open(path, 'r') as f:
+        buffer = ''
+
+        def next_token(position):
+            # Position of the next non-whitespace character, reading on if the buffer
+            # ends in whitespace; len(buffer) at the end of the file
+            nonlocal buffer
+            while True:
+                position = skip(buffer, position).end()
+                if position < len(buffer):
+                    return position
+                more = f.read(chunk_size)
+                if not more:
+                    return position
+                buffer, position = more, 0
+
+        position = next_token(0)
+        if not buffer.startswith('[', position):
+            raise ValueError(f"{path} is not a JSON array")
+
+        position = next_token(position + 1)
+        while not buffer.startswith(']', position):
+            try:
+                date, end = decoder.raw_decode(buffer, position)
+                # A scalar ending right at the buffer end may continue in the next chunk
+                complete = end < len(buffer)
+            except json.JSONDecodeError:
+                complete = False
+            if not complete:
+                # Element runs past the buffer: read more, doubling so big dates stay linear
+                more = f.read(max(chunk_size, len(buffer) - position))
+                if more:
+                    buffer, position = buffer[position:] + more, 0
+                    continue
+                # End of file: a trailing scalar is fine, anything else is truncated
+                date, end = decoder.raw_decode(buffer, position)
+
+            yield date
+            position = next_token(end)
+            if buffer.startswith(',', position):
+                position = next_token(position + 1)
+            elif not buffer.startswith(']', position):
+                raise ValueError(f"{path}: expected ',' or ']' at offset {position} of the current chunk")
+
+def dedupe_options(options):
+    latest = {}
+    for position, option in enumerate(options):
+        # Records without an id can't be matched up, so they are kept as they are
+        key = option.get('id') if isinstance(option, dict) else None
+        latest[('position', position) if key is None else key] = option
+    return list(latest.values())
+
+def dedupe_date(date):
+    if isinstance(date, dict) and isinstance(date.get('options'), list):
+        date['options'] = dedupe_options(date['options'])
+    return date
+
+def _dedupe_dates(dates, workers):
+    if workers <= 1:
+        yield from map(dedupe_date, dates)
+        return
+
+    # Executor.map would submit the whole input up front, so keep a bounded window in order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for date in dates:
+            pending.append(executor.submit(dedupe_date, date))
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def remove_duplicates(input_path, output_path, workers=1):
+    # Same layout as json.dump(data, f, indent=4), written through a temp file so the
+    # output can replace the input in place
+    tmp_path = output_path + '.tmp'
+    count = 0
+    with open(tmp_path, 'w') as f:
+        for date in _dedupe_dates(iter_dates(input_path), workers):
+            f.write(',\n' if count else '[\n')
+            f.write(textwrap.indent(json.dumps(date, indent=4), '    '))
+            count += 1
+        f.write('\n]' if count else '[]')
+    os.replace(tmp_path, output_path)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate option history exports by contract id, last write wins.")
+    parser.add_argument('input', nargs='?', default='options_data_2.json')
+    parser.add_argument('output', nargs='?', default='options_data_3.json')
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    count = remove_duplicates(args.input, args.output, args.workers)
+    print(f"Wrote {count} dates to {args.output}")
+
+if __name__ == "__main__":
+    main()
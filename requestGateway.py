@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from metrics import record_retry
+
+# One client-side gateway for provider requests: a token bucket per endpoint (plus one
+# per provider), coalescing of identical in-flight requests, and jittered exponential
+# backoff when the provider throttles us.
+
+# (requests per second, burst). Endpoints fall back to their provider's entry.
+ENDPOINT_LIMITS = {
+    'robinhood': (15.0, 30),
+    'robinhood.option_market_data': (5.0, 10),
+    'robinhood.option_historicals': (8.0, 16),
+    'robinhood.find_options': (8.0, 16),
+}
+DEFAULT_LIMIT = (5.0, 10)
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Throttled endpoints slow down multiplicatively and recover a little on every success
+THROTTLE_DECREASE = 0.5
+RECOVERY_STEP = 0.05
+MIN_RATE_FRACTION = 0.1
+
+class RetryableError(Exception):
+    def __init__(self, message, retry_after=None, throttled=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(self.base_rate * MIN_RATE_FRACTION, self.rate * THROTTLE_DECREASE)
+            self.tokens = 0
+
+    def succeeded(self):
+        if self.rate < self.base_rate:
+            with self.lock:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+
+class _InFlight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class RequestGateway:
+    def __init__(self, limits=None):
+        self.limits = ENDPOINT_LIMITS if limits is None else limits
+        self.buckets = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, name):
+        with self.lock:
+            bucket = self.buckets.get(name)
+            if bucket is None:
+                rate, burst = self.limits.get(name) or self.limits.get(name.split('.')[0], DEFAULT_LIMIT)
+                bucket = self.buckets[name] = TokenBucket(rate, burst)
+            return bucket
+
+    def _buckets_for(self, endpoint):
+        provider = endpoint.split('.')[0]
+        buckets = [self._bucket(provider)]
+        if endpoint != provider:
+            buckets.append(self._bucket(endpoint))
+        return buckets
+
+    def _attempt(self, endpoint, function, args, kwargs):
+        buckets = self._buckets_for(endpoint)
+        for attempt in range(MAX_RETRIES + 1):
+            for bucket in buckets:
+                bucket.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except (RetryableError, OSError) as e:
+                if getattr(e, 'throttled', False):
+                    for bucket in buckets:
+                        bucket.throttled()
+                if attempt == MAX_RETRIES:
+                    raise
+                # Full jitter, but never sooner than the provider's Retry-After
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                delay = max(delay, getattr(e, 'retry_after', None) or 0)
+                record_retry(endpoint)
+                print(f"{endpoint} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            for bucket in buckets:
+                bucket.succeeded()
+            return result
+
+    def call(self, endpoint, key, function, *args, **kwargs):
+        # Callers asking for the same (endpoint, key) while a request is in flight share its result
+        flight_key = (endpoint, key)
+        with self.lock:
+            flight = self.in_flight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[flight_key] = _InFlight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._attempt(endpoint, function, args, kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[flight_key]
+            flight.event.set()
+
+# Shared by every module (and both sessions when they run in one process)
+gateway = RequestGateway()
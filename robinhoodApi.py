@@ -0,0 +1,108 @@
+from metrics import timed
+from requestGateway import RetryableError, gateway
+
+# Thin wrappers around the Robinhood endpoints we poll. They read raw responses so a
+# throttled request reaches the gateway and is retried, and the by-id ones let callers
+# holding a cached instrument id skip robin_stocks' extra instruments request.
+
+# Instrument URLs per marketdata request, keeps the query string well under URL limits
+MARKET_DATA_BATCH_SIZE = 40
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+def _get_json(endpoint, url, payload):
+    # Raw response instead of robin_stocks' jsonified one, which turns a 429 into a silent None
+    from robin_stocks.robinhood.helper import request_get # type: ignore
+
+    with timed(endpoint) as call:
+        response = request_get(url, 'regular', payload, jsonify_data=False)
+        status = response.status_code
+        if status == 429 or status >= 500:
+            raise RetryableError(f"HTTP {status}", _retry_after(response), throttled=status == 429)
+        if status >= 400:
+            call.failed()
+            print(f"{endpoint} returned HTTP {status}")
+            return None
+        return response.json()
+
+def _gateway_get(endpoint, key, url, payload):
+    try:
+        return gateway.call(endpoint, key, _get_json, endpoint, url, payload)
+    except (RetryableError, OSError) as e:
+        print(f"Giving up on {endpoint}: {e}")
+        return None
+
+# symbol -> options chain id, fixed for the life of a listing
+_chain_ids = {}
+
+def get_stock_quote(symbol):
+    from robin_stocks.robinhood.urls import quotes_url # type: ignore
+
+    data = _gateway_get('robinhood.stock_quote', symbol, quotes_url(), {'symbols': symbol})
+    results = (data or {}).get('results') or []
+    return results[0] if results else None
+
+def _chain_id(symbol):
+    from robin_stocks.robinhood.urls import instruments_url # type: ignore
+
+    if symbol not in _chain_ids:
+        data = _gateway_get('robinhood.instruments', symbol, instruments_url(), {'symbol': symbol})
+        results = (data or {}).get('results') or []
+        if not results or not results[0].get('tradable_chain_id'):
+            return None
+        _chain_ids[symbol] = results[0]['tradable_chain_id']
+    return _chain_ids[symbol]
+
+def find_options(symbol, expiration, strike, option_type='call'):
+    # Option instruments for one contract, without the per-contract market data request
+    # r.find_options_by_expiration_and_strike adds
+    from robin_stocks.robinhood.urls import option_instruments_url # type: ignore
+
+    chain_id = _chain_id(symbol)
+    if chain_id is None:
+        return []
+    payload = {
+        'chain_id': chain_id,
+        'chain_symbol': symbol,
+        'state': 'active',
+        'expiration_dates': expiration,
+        'strike_price': f"{float(strike):.4f}",
+        'type': option_type,
+    }
+    data = _gateway_get('robinhood.find_options', (symbol, expiration, float(strike), option_type), option_instruments_url(), payload)
+    return [item for item in (data or {}).get('results') or [] if item and item.get('expiration_date') == expiration]
+
+def get_option_historicals_by_id(instrument_id, interval='5minute', span='day', bounds='regular'):
+    from robin_stocks.robinhood.urls import option_historicals_url # type: ignore
+
+    payload = {'span': span, 'interval': interval, 'bounds': bounds}
+    data = _gateway_get('robinhood.option_historicals', (instrument_id, interval, span, bounds), option_historicals_url(instrument_id), payload)
+    if not data:
+        return []
+    return data.get('data_points', [])
+
+def _market_data_instrument_id(item):
+    return item.get('instrument_id') or item['instrument'].rstrip('/').split('/')[-1]
+
+def get_option_market_data_by_ids(instrument_ids):
+    # One marketdata request per batch of contracts instead of one per contract (and
+    # r.get_option_market_data_by_id's extra instrument lookup). Returns {instrument_id: data}.
+    from robin_stocks.robinhood.urls import option_instruments_url, marketdata_options_url # type: ignore
+
+    unique_ids = list(dict.fromkeys(instrument_ids))
+    market_data = {}
+
+    for start in range(0, len(unique_ids), MARKET_DATA_BATCH_SIZE):
+        batch = unique_ids[start:start + MARKET_DATA_BATCH_SIZE]
+        payload = {'instruments': ','.join(option_instruments_url(instrument_id) for instrument_id in batch)}
+        data = _gateway_get('robinhood.option_market_data', tuple(batch), marketdata_options_url(), payload)
+
+        for item in (data or {}).get('results') or []:
+            if item:
+                market_data[_market_data_instrument_id(item)] = item
+
+    return market_data
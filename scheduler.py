@@ -0,0 +1,163 @@
+import heapq
+import os
+import time
+from datetime import date as ddate, datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Market hours are defined in New York time; zoneinfo handles DST both ways
+MARKET_TZ = ZoneInfo('America/New_York')
+PACIFIC_TZ = ZoneInfo('America/Los_Angeles')
+MARKET_OPEN = dtime(9, 30)
+
+# Per-contract poll cadence (seconds). Contracts making new highs, and everything in
+# the first OPEN_WINDOW after the bell, poll at MIN_POLL_INTERVAL; flat or untraded
+# contracts back off towards MAX_POLL_INTERVAL.
+MIN_POLL_INTERVAL = 5
+BASE_POLL_INTERVAL = 10
+MAX_POLL_INTERVAL = 60
+FLAT_BACKOFF = 1.25
+NO_TRADE_BACKOFF = 1.5
+OPEN_WINDOW = timedelta(minutes=15)
+
+# Contracts due within this many seconds of each other share one batched request
+COALESCE_WINDOW = 1.0
+
+# Unscheduled closures (national days of mourning and the like), as YYYY-MM-DD,YYYY-MM-DD
+EXTRA_CLOSURES = {value.strip() for value in os.getenv('MARKET_EXTRA_CLOSURES', '').split(',') if value.strip()}
+
+def _nth_weekday(year, month, weekday, n):
+    # n-th given weekday of the month, or the last one for n=-1
+    if n > 0:
+        first = ddate(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = ddate(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return ddate(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+def _observed(day):
+    # Saturday holidays close the Friday before, Sunday ones the Monday after
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year):
+    holidays = {
+        _nth_weekday(year, 1, 0, 3), # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3), # Washington's Birthday
+        _easter(year) - timedelta(days=2), # Good Friday
+        _nth_weekday(year, 5, 0, -1), # Memorial Day
+        _observed(ddate(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1), # Labor Day
+        _nth_weekday(year, 11, 3, 4), # Thanksgiving
+        _observed(ddate(year, 12, 25)),
+    }
+    # A Saturday New Year's Day is not moved back into the previous year
+    new_year = ddate(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(ddate(year, 6, 19)))
+    return frozenset(holidays)
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in nyse_holidays(day.year) and day.isoformat() not in EXTRA_CLOSURES
+
+def next_trading_day(day):
+    day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+def market_open_at(day=None):
+    day = day or datetime.now(MARKET_TZ).date()
+    return datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TZ)
+
+def now_pacific():
+    return datetime.now(PACIFIC_TZ)
+
+def sleep_until(deadline):
+    # One sleep to an aware deadline instead of waking up every 30 seconds to check
+    remaining = (deadline - datetime.now(deadline.tzinfo)).total_seconds()
+    if remaining > 0:
+        print(f"Waiting until {deadline.astimezone(PACIFIC_TZ).strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+        time.sleep(remaining)
+
+class PollSchedule:
+    # Min-heap of (next poll time, contract index), with an adaptive interval per contract
+
+    def __init__(self, count, open_time, start=None):
+        start = time.time() if start is None else start
+        self.open_ts = open_time.timestamp()
+        self.intervals = [BASE_POLL_INTERVAL] * count
+        self.heap = [(start, i) for i in range(count)]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def next_deadline(self):
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now + COALESCE_WINDOW:
+            due.append(heapq.heappop(self.heap)[1])
+        return due
+
+    def reschedule(self, index, now, rising, traded):
+        interval = self.intervals[index]
+        if rising:
+            interval = MIN_POLL_INTERVAL
+        elif not traded:
+            interval *= NO_TRADE_BACKOFF
+        else:
+            interval *= FLAT_BACKOFF
+        interval = max(MIN_POLL_INTERVAL, min(MAX_POLL_INTERVAL, interval))
+        self.intervals[index] = interval
+
+        # Around the open everything moves, so nobody backs off yet
+        if self.open_ts <= now < self.open_ts + OPEN_WINDOW.total_seconds():
+            interval = MIN_POLL_INTERVAL
+
+        heapq.heappush(self.heap, (now + interval, index))
+
+def run_polling_session(tracker, session_end, on_update, open_time=None):
+    # Polls each contract when its deadline comes up until the hard session end
+    schedule = PollSchedule(len(tracker), open_time or market_open_at())
+    end_ts = session_end.timestamp()
+
+    while schedule:
+        now = time.time()
+        if now >= end_ts:
+            break
+
+        deadline = schedule.next_deadline()
+        if deadline > now:
+            time.sleep(min(deadline, end_ts) - now)
+            continue
+
+        due = schedule.pop_due(now)
+        updated = tracker.poll(due)
+        if updated:
+            on_update(updated)
+
+        now = time.time()
+        for i in due:
+            schedule.reschedule(i, now, tracker.rising[i], tracker.traded[i])
+
+    print("Session ended")
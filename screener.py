@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import time
+import urllib.parse
+import urllib.request
+from metrics import timed
+
+# Premarket gapper screen: market cap >= 2B and premarket move >= 8%, then a front
+# expiry at most 6 days out once the symbol's expirations are known
+MIN_MARKET_CAP = 2_000_000_000
+MIN_PREMARKET_CHANGE = 8.0
+MAX_DAYS_TO_EXPIRY = 6
+
+COLUMN_NAMES = ['Symbol', 'Company Name', 'Market Cap', 'Premkt. Chg.', 'Premkt. Price', 'Close']
+
+# stockanalysis.com serves the screener table as JSON, so no browser is needed to read it
+SCREENER_URL = os.getenv('SCREENER_URL', 'https://api.stockanalysis.com/api/screener/s/f')
+SCREENER_FIELDS = ['s', 'n', 'marketCap', 'premarketChangePercent', 'premarketPrice', 'close']
+SCREENER_FIXTURE = os.getenv('SCREENER_FIXTURE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'screener_premarket.json'))
+
+def _format_market_cap(market_cap):
+    for suffix, size in (('T', 1e12), ('B', 1e9), ('M', 1e6)):
+        if market_cap >= size:
+            return f"{market_cap / size:.2f}{suffix}"
+    return f"{market_cap:.0f}"
+
+def _format_price(price):
+    return f"{price:,.2f}" if price is not None else '-'
+
+def _records_to_rows(records):
+    # Apply the screen locally and emit rows in the same shape the Selenium scrape produced
+    rows = []
+    for record in records:
+        market_cap = record.get('marketCap')
+        change = record.get('premarketChangePercent')
+        price = record.get('premarketPrice')
+        if market_cap is None or change is None or price is None:
+            continue
+        if market_cap < MIN_MARKET_CAP or change < MIN_PREMARKET_CHANGE:
+            continue
+
+        fields = [record['s'], record.get('n', ''), _format_market_cap(market_cap), f"{change:.2f}%", _format_price(price), _format_price(record.get('close'))]
+        rows.append({COLUMN_NAMES[i]: fields[i] for i in range(len(COLUMN_NAMES))})
+
+    # Biggest gappers first, same as the sorted screener table
+    rows.sort(key=lambda row: float(row['Premkt. Chg.'].rstrip('%')), reverse=True)
+    return rows
+
+def _screener_records(payload):
+    data = payload.get('data', payload)
+    return data.get('data', []) if isinstance(data, dict) else data
+
+def fetch_http_rows():
+    query = urllib.parse.urlencode({
+        'm': 'premarketChangePercent',
+        's': 'desc',
+        'c': ','.join(SCREENER_FIELDS),
+        'f': f"marketCap-over-{MIN_MARKET_CAP},premarketChangePercent-over-{MIN_PREMARKET_CHANGE:g}",
+        'i': 'stocks',
+    })
+    request = urllib.request.Request(f"{SCREENER_URL}?{query}", headers={'User-Agent': 'Mozilla/5.0', 'Accept': 'application/json'})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        payload = json.load(response)
+    return _records_to_rows(_screener_records(payload))
+
+def fetch_fixture_rows(path=None):
+    # Recorded screener response for offline runs and tests
+    with open(path or SCREENER_FIXTURE, 'r') as f:
+        payload = json.load(f)
+    return _records_to_rows(_screener_records(payload))
+
+def fetch_selenium_rows():
+    # Original headless Chrome scrape, kept as a fallback if the JSON endpoint changes
+    from selenium import webdriver # type: ignore
+    from selenium.webdriver.chrome.service import Service # type: ignore
+    from selenium.webdriver.chrome.options import Options # type: ignore
+    from selenium.webdriver.common.by import By # type: ignore
+    from selenium.webdriver.support.ui import WebDriverWait # type: ignore
+    from selenium.webdriver.support import expected_conditions as EC # type: ignore
+
+    # Explicitly set to the correct path for chromedriverGitHub
+    chromedriver_path = "/usr/local/bin/chromedriver"  # Adjust this path
+    
+    # Set up Selenium with the local chromedriver
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+
+    service = Service(chromedriver_path)
+    driver = webdriver.Chrome(service=service, options=options)
+    
+    # The rest of your code
+    driver.get('https://stockanalysis.com/stocks/screener/')
+    wait = WebDriverWait(driver, 10)
+    print("Page loaded")
+    time.sleep(2)
+
+    button = wait.until(EC.element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Add Filters')]/ancestor::button")))
+    button.click()
+    time.sleep(0.5)
+
+    marketCap = wait.until(EC.element_to_be_clickable((By.ID, "marketCap")))
+    marketCap.click()
+    time.sleep(0.5)
+    
+    postmarketChangePercent = wait.until(EC.element_to_be_clickable((By.ID, "premarketChangePercent")))
+    postmarketChangePercent.click()
+    time.sleep(0.5)
+
+    afterHoursPrice = wait.until(EC.element_to_be_clickable((By.ID, "premarketPrice")))
+    afterHoursPrice.click()
+    time.sleep(0.5)
+
+    marketClosePrice = wait.until(EC.element_to_be_clickable((By.ID, "close")))
+    marketClosePrice.click()
+    time.sleep(0.5)
+
+    close_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'button[aria-label="Close"]')))
+    close_button.click()
+    time.sleep(0.5)
+    print("Filters added")
+
+    first_any_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[span[text()='Any']]")))
+    first_any_button.click()
+    time.sleep(0.5)
+
+    input_element = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Value']")
+    input_element.clear()
+    input_element.send_keys("2B")
+    time.sleep(0.5)
+    
+    second_any_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[span[text()='Any']]")))
+    second_any_button.click()
+    time.sleep(0.5)
+
+    input_element = driver.find_element(By.CSS_SELECTOR, "input[placeholder='Value']")
+    input_element.clear()
+    input_element.send_keys("8")
+    print("Filters set")
+    
+    time.sleep(0.5)
+
+    filters_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//li/button[contains(@class, 'dont-move') and contains(text(), 'Filters')]")))
+    filters_button.click()
+    time.sleep(2)
+
+    tbody = driver.find_element(By.CSS_SELECTOR, 'tbody')
+
+    data = []
+    lines = tbody.text.strip().split('\n')
+
+    for line in lines:
+        match = re.match(r'(\w+)\s+([\w\s,.&-]+?)\s+(\d+\.\d+B)\s+(-?\d+\.\d+%)?\s+([\d,.]+)\s+(-|[\d,.]+)', line)
+        if match:
+            fields = match.groups()
+            row_dict = {COLUMN_NAMES[i]: fields[i] for i in range(len(COLUMN_NAMES))}
+            data.append(row_dict)
+
+    driver.quit()
+    print("Browser closed")
+
+    return data
+
+SCREENER_SOURCES = {
+    'http': fetch_http_rows,
+    'fixture': fetch_fixture_rows,
+    'selenium': fetch_selenium_rows,
+}
+
+def get_screener_rows(source=None):
+    source = source or os.getenv('SCREENER_SOURCE', 'http')
+    if source not in SCREENER_SOURCES:
+        raise ValueError(f"Unknown screener source: {source}")
+
+    start = time.monotonic()
+    with timed(f"screener.{source}"):
+        rows = SCREENER_SOURCES[source]()
+    print(f"Screener ({source}) returned {len(rows)} rows in {time.monotonic() - start:.2f}s")
+    return rows
@@ -0,0 +1,170 @@
+import base64
+import json
+import os
+import threading
+import time
+from metrics import timed
+
+# Authenticated clients, created on first use rather than at import time so the
+# modules stay cheap to import for tests and tooling.
+
+# Optional encrypted Robinhood token cache: set ROBIN_SESSION_KEY to a Fernet key
+# (cryptography.fernet.Fernet.generate_key()) to reuse a still-valid token across runs
+ROBIN_SESSION_PATH = os.getenv('ROBIN_SESSION_PATH', '.robinhood_session')
+# Treat tokens as expired this many seconds early
+SESSION_EXPIRY_MARGIN = 600
+
+# Seconds before a Robinhood request gives up; robin_stocks sends them without a timeout
+ROBINHOOD_REQUEST_TIMEOUT = 10
+
+# Assumed token lifetime when a login response doesn't say (robin_stocks' default)
+DEFAULT_TOKEN_LIFETIME = 86400
+
+_lock = threading.Lock()
+_db = None
+# Epoch seconds the current Robinhood token stops being usable, 0 when logged out
+_logged_in_until = 0
+_env_loaded = False
+
+def load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv # type: ignore
+        load_dotenv()
+        _env_loaded = True
+
+def get_db():
+    global _db
+    with _lock:
+        if _db is not None:
+            return _db
+
+        load_env()
+        import firebase_admin # type: ignore
+        from firebase_admin import credentials, firestore # type: ignore
+
+        # Decode the base64-encoded service account key from the environment variable
+        firebase_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
+        if not firebase_key:
+            raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY not set or loaded properly.")
+
+        service_account_info = json.loads(base64.b64decode(firebase_key).decode('utf-8'))
+        cred = credentials.Certificate(service_account_info)
+        firebase_admin.initialize_app(cred)
+        _db = firestore.client()
+        return _db
+
+def _session_cipher():
+    key = os.getenv('ROBIN_SESSION_KEY')
+    if not key:
+        return None
+    try:
+        from cryptography.fernet import Fernet # type: ignore
+    except ImportError:
+        print("ROBIN_SESSION_KEY is set but cryptography is not installed; not caching the session.")
+        return None
+    return Fernet(key.encode('utf-8'))
+
+def _load_cached_session(cipher):
+    try:
+        with open(ROBIN_SESSION_PATH, 'rb') as f:
+            session = json.loads(cipher.decrypt(f.read()).decode('utf-8'))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable Robinhood session cache: {e}")
+        return None
+
+    if session.get('expires_at', 0) - SESSION_EXPIRY_MARGIN <= time.time():
+        return None
+    return session
+
+def _save_cached_session(cipher, login):
+    if not login or 'access_token' not in login:
+        return
+    session = {
+        'access_token': login['access_token'],
+        'token_type': login.get('token_type', 'Bearer'),
+        'refresh_token': login.get('refresh_token'),
+        'expires_at': time.time() + float(login.get('expires_in', 0)),
+    }
+    tmp_path = ROBIN_SESSION_PATH + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(cipher.encrypt(json.dumps(session).encode('utf-8')))
+    os.chmod(tmp_path, 0o600)
+    os.replace(tmp_path, ROBIN_SESSION_PATH)
+
+def _resume_session(session):
+    # Same check robin_stocks runs on its own pickled session: one authenticated request
+    from robin_stocks.robinhood.helper import request_get, set_login_state, update_session # type: ignore
+    from robin_stocks.robinhood.urls import positions_url # type: ignore
+
+    update_session('Authorization', f"{session['token_type']} {session['access_token']}")
+    set_login_state(True)
+    try:
+        with timed('robinhood.resume_session'):
+            res = request_get(positions_url(), 'pagination', {'nonzero': 'true'}, jsonify_data=False)
+            res.raise_for_status()
+        return True
+    except Exception as e:
+        print(f"Cached Robinhood session rejected, logging in again: {e}")
+        set_login_state(False)
+        update_session('Authorization', None)
+        return False
+
+def _set_request_timeout():
+    # Default timeout for every request on robin_stocks' shared session, so a hung call
+    # fails and releases its slot instead of holding it indefinitely
+    from robin_stocks.robinhood import helper # type: ignore
+
+    session = getattr(helper, 'SESSION', None)
+    if session is None or getattr(session.request, 'with_default_timeout', False):
+        return
+    request = session.request
+
+    def request_with_timeout(method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = ROBINHOOD_REQUEST_TIMEOUT
+        return request(method, url, **kwargs)
+
+    request_with_timeout.with_default_timeout = True
+    session.request = request_with_timeout
+
+def login_robinhood():
+    # No-op while the token is still valid, so long-running processes can call it before
+    # every session and only log in again once it expires
+    global _logged_in_until
+    with _lock:
+        if time.time() < _logged_in_until - SESSION_EXPIRY_MARGIN:
+            return
+
+        load_env()
+        import pyotp # type: ignore
+        import robin_stocks.robinhood as r # type: ignore
+        _set_request_timeout()
+
+        mfa_key = os.getenv('ROBIN_MFA')
+        username = os.getenv('ROBIN_USERNAME')
+        password = os.getenv('ROBIN_PASSWORD')
+        if not all([mfa_key, username, password]):
+            raise EnvironmentError("One or more environment variables are missing.")
+
+        cipher = _session_cipher()
+        session = _load_cached_session(cipher) if cipher else None
+        if session and _resume_session(session):
+            print("Logged in (cached session)")
+            _logged_in_until = session['expires_at']
+            return
+
+        # Generate the MFA code using pyotp
+        totp = pyotp.TOTP(mfa_key).now()
+
+        # Login to Robinhood using the MFA code
+        with timed('robinhood.login'):
+            login = r.login(username, password, store_session=False, mfa_code=totp)
+
+        if cipher:
+            _save_cached_session(cipher, login)
+
+        print("Logged in")
+        _logged_in_until = time.time() + float((login or {}).get('expires_in') or DEFAULT_TOKEN_LIFETIME)
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Every sampled quote lands in a fixed-size in-memory ring and is flushed, column by
+# column, to append-only files under ticks/<date>/<writer>/. Reads memory-map them.
+TICKS_DIR = os.getenv('TICKS_DIR', 'ticks')
+RING_CAPACITY = 4096
+
+# A background thread also flushes the ring this often (seconds), so a crash loses at
+# most this much however slowly contracts are being polled
+FLUSH_INTERVAL = 5.0
+
+COLUMNS = {
+    'timestamp': np.float64,
+    'contract': np.int32,
+    'last': np.float64,
+    'bid': np.float64,
+    'ask': np.float64,
+    'mark': np.float64,
+    'high': np.float64,
+}
+QUOTE_COLUMNS = ('last', 'bid', 'ask', 'mark', 'high')
+QUOTE_FIELDS = ('last_trade_price', 'bid_price', 'ask_price', 'mark_price', 'high_price')
+
+def _nan_if_none(value):
+    return np.nan if value is None else value
+
+class TickRecorder:
+    def __init__(self, date, writer, directory=TICKS_DIR, capacity=RING_CAPACITY):
+        self.path = os.path.join(directory, date, writer)
+        os.makedirs(self.path, exist_ok=True)
+        self.capacity = capacity
+        self.ring = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.lock = threading.Lock()
+
+        # Appending after a crash mid-flush would misalign the columns for good
+        _truncate_to_whole_rows(self.path)
+
+        # Contract ids are stored once; the contract column holds their index
+        self.contracts = _read_contracts(self.path)
+        self.contracts_dirty = False
+
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, name='tick-flush', daemon=True)
+        self.thread.start()
+
+    def _contract_index(self, option_id):
+        index = self.contracts.get(option_id)
+        if index is None:
+            index = self.contracts[option_id] = len(self.contracts)
+            self.contracts_dirty = True
+        return index
+
+    def record(self, option_id, quote, timestamp=None):
+        if quote is None:
+            return
+        with self.lock:
+            if self.size == self.capacity:
+                self._flush()
+
+            row = self.size
+            self.ring['timestamp'][row] = time.time() if timestamp is None else timestamp
+            self.ring['contract'][row] = self._contract_index(option_id)
+            for column, field in zip(QUOTE_COLUMNS, QUOTE_FIELDS):
+                self.ring[column][row] = _nan_if_none(getattr(quote, field))
+            self.size += 1
+
+    def _flush(self):
+        if self.contracts_dirty:
+            _write_json(os.path.join(self.path, 'contracts.json'), self.contracts)
+            self.contracts_dirty = False
+
+        if not self.size:
+            return
+        for name in COLUMNS:
+            with open(os.path.join(self.path, f"{name}.bin"), 'ab') as f:
+                f.write(self.ring[name][:self.size].tobytes())
+        self.size = 0
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush_loop(self):
+        while not self.stopping.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def close(self):
+        # Final flush plus a by-contract row index so a contract's ticks can be sliced out
+        self.stopping.set()
+        self.thread.join()
+        with self.lock:
+            self._flush()
+            build_contract_index(self.path)
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+def _truncate_to_whole_rows(path):
+    # Cut every column back to the row count all of them (and a missing one) agree on
+    sizes = {}
+    for name, dtype in COLUMNS.items():
+        column_path = os.path.join(path, f"{name}.bin")
+        sizes[column_path] = os.path.getsize(column_path) if os.path.exists(column_path) else 0
+    rows = min(size // np.dtype(dtype).itemsize for size, dtype in zip(sizes.values(), COLUMNS.values()))
+    for (column_path, size), dtype in zip(sizes.items(), COLUMNS.values()):
+        if size != rows * np.dtype(dtype).itemsize:
+            print(f"Truncating {column_path} to {rows} rows after an interrupted flush")
+            os.truncate(column_path, rows * np.dtype(dtype).itemsize)
+
+def _read_contracts(path):
+    try:
+        with open(os.path.join(path, 'contracts.json'), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def load_ticks(path):
+    # Columns as read-only memory maps, nothing is copied into RAM up front
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        column_path = os.path.join(path, f"{name}.bin")
+        if not os.path.exists(column_path) or not os.path.getsize(column_path):
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(column_path, dtype=dtype, mode='r')
+
+    # A crash mid-flush can leave columns at different lengths; only whole rows count
+    rows = min(len(column) for column in columns.values())
+    return {name: column[:rows] for name, column in columns.items()}
+
+def build_contract_index(path):
+    ticks = load_ticks(path)
+    order = np.argsort(ticks['contract'], kind='stable').astype(np.int64)
+    counts = np.bincount(ticks['contract'], minlength=len(_read_contracts(path))) if len(order) else np.zeros(0, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    order.tofile(os.path.join(path, 'by_contract.bin'))
+    _write_json(os.path.join(path, 'by_contract.json'), {'rows': int(len(order)), 'offsets': offsets.tolist()})
+
+def contract_ticks(path, option_id):
+    # Rows for one contract, in time order, via the by-contract index when it is current
+    ticks = load_ticks(path)
+    index = _read_contracts(path).get(option_id)
+    if index is None:
+        return {name: column[:0] for name, column in ticks.items()}
+
+    try:
+        with open(os.path.join(path, 'by_contract.json'), 'r') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        meta = None
+
+    if meta and meta['rows'] == len(ticks['contract']) and index + 1 < len(meta['offsets']):
+        order = np.memmap(os.path.join(path, 'by_contract.bin'), dtype=np.int64, mode='r') if meta['rows'] else np.empty(0, dtype=np.int64)
+        rows = order[meta['offsets'][index]:meta['offsets'][index + 1]]
+    else:
+        rows = np.flatnonzero(ticks['contract'] == index)
+
+    return {name: np.asarray(column[rows]) for name, column in ticks.items()}